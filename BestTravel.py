@@ -1,7 +1,18 @@
 import itertools
+import random
+import time
+from bisect import bisect_left, bisect_right
+from math import comb
 
+# largest number of bit operations (n * k * t / 64) worth doing in the bitset DP
+_DP_BUDGET = 1 << 26
+# largest number of partial sums per half worth enumerating for meet-in-the-middle
+_MITM_BUDGET = 1 << 18
+# largest number of suffix sums precomputed for the last levels of branch-and-bound
+_TABLE_BUDGET = 1 << 20
 
-def choose_best_sum(t, k, ls):
+
+def _choose_best_sum_combinations(t, k, ls):
     possible_options = []
     for subset in itertools.combinations(ls, k):
         s = sum(subset)
@@ -10,3 +21,243 @@ def choose_best_sum(t, k, ls):
     if len(possible_options) > 0:
         return sorted(possible_options)[-1]
     return None
+
+
+def _reach_bitsets(ls, k, limit):
+    '''
+    Returns: reach with reach[c] having bit s set when some c of the values
+    sum to s <= limit, c <= k. Only for non-negative values.
+    '''
+    mask = (1 << limit + 1) - 1
+    reach = [1] + [0] * k
+    used = 0
+    for v in ls:
+        if v > limit:
+            continue
+        used = min(used + 1, k)
+        for c in range(used, 0, -1):
+            reach[c] |= reach[c - 1] << v & mask
+    return reach
+
+
+def _bitset_dp(t, k, ls):
+    sums = _reach_bitsets(ls, k, t)[k]
+    return sums.bit_length() - 1 if sums else None
+
+
+def _sums_by_count(values, k):
+    '''
+    Returns: levels with levels[c] the sorted distinct sums of c of the values, c <= k
+    '''
+    levels = [[0]] + [[] for _ in range(min(k, len(values)))]
+    for i, v in enumerate(values):
+        for c in range(min(i + 1, len(levels) - 1), 0, -1):
+            levels[c].extend(x + v for x in levels[c - 1])
+    return [sorted(set(level)) for level in levels]
+
+
+def _meet_in_the_middle(t, k, ls):
+    half = len(ls) // 2
+    left, right = _sums_by_count(ls[:half], k), _sums_by_count(ls[half:], k)
+    best = None
+    for c in range(max(0, k - len(right) + 1), min(k, len(left) - 1) + 1):
+        others = right[k - c]
+        for a in left[c]:
+            i = bisect_right(others, t - a)
+            if i and (best is None or a + others[i - 1] > best):
+                best = a + others[i - 1]
+                if best == t:
+                    return best
+    return best
+
+
+def _suffix_sums(values, depth):
+    '''
+    Returns: tables with tables[c][i] the sorted distinct sums of c of the
+    values from index i on, for 1 <= c <= depth
+    '''
+    n = len(values)
+    tables = [[[0]] * (n + 1)]
+    for c in range(1, depth + 1):
+        previous = tables[-1]
+        table = [[] for _ in range(n + 1)]
+        for i in range(n - 1, -1, -1):
+            v = values[i]
+            table[i] = sorted(set(table[i + 1]).union(v + x for x in previous[i + 1]))
+        tables.append(table)
+    return tables
+
+
+def _split_bound(t, k, ls, attempts=3):
+    '''
+    Meet-in-the-middle restricted to k // 2 values from one half of the values
+    and the rest from the other half, over a few fixed partitions: the sorted
+    values taken alternately, then shuffled with fixed seeds.
+    Returns: the largest such sum that is at most t, a lower bound for
+    choose_best_sum, or None when there is none or the halves have too many
+    subsets of that size
+    '''
+    values = sorted(ls)
+    c = k // 2
+    if comb(len(values) // 2, c) > _MITM_BUDGET or comb((len(values) + 1) // 2, k - c) > _MITM_BUDGET:
+        return None
+    best = None
+    for attempt in range(attempts):
+        if attempt:
+            random.Random(attempt).shuffle(values)
+        others = sorted(set(map(sum, itertools.combinations(values[1::2], k - c))))
+        for a in set(map(sum, itertools.combinations(values[0::2], c))):
+            i = bisect_right(others, t - a)
+            if i and (best is None or a + others[i - 1] > best):
+                best = a + others[i - 1]
+                if best == t:
+                    return best
+    return best
+
+
+def _branch_and_bound(t, k, ls, best=None):
+    '''
+    Depth-first over the values sorted in decreasing order, starting from a
+    known sum best if given. A choice that still needs c values starts at the
+    first value that leaves room for the c-1 smallest, and stops as soon as
+    the next c values cannot beat the best sum found or fit under t, when they
+    are the best completion. The last few values come from a bisection in the
+    precomputed sums of the suffix.
+    '''
+    values = sorted(ls, reverse=True)
+    negated = [-v for v in values]
+    n = len(values)
+    prefix = list(itertools.accumulate(values, initial=0))
+    depth = 1
+    while depth < min(k, 3) and comb(n + 1, depth + 2) <= _TABLE_BUDGET:
+        depth += 1
+    tables = _suffix_sums(values, depth)
+
+    def search(start, remaining, total):
+        nonlocal best
+        target = t - total
+        if remaining <= depth:
+            sums = tables[remaining][start]
+            i = bisect_right(sums, target)
+            if i and (best is None or total + sums[i - 1] > best):
+                best = total + sums[i - 1]
+            return
+        # values[i] + the remaining - 1 smallest must be at most target
+        smallest = prefix[n] - prefix[n - remaining + 1]
+        previous = None
+        for i in range(bisect_left(negated, smallest - target, start), n - remaining + 1):
+            upper = total + prefix[i + remaining] - prefix[i]
+            if best is not None and upper <= best:
+                return
+            if upper <= t:
+                best = upper
+                return
+            # the same value at the same depth gives the same subtrees
+            if values[i] == previous:
+                continue
+            previous = values[i]
+            search(i + 1, remaining - 1, total + values[i])
+            if best == t:
+                return
+
+    search(0, k, 0)
+    return best
+
+
+def choose_best_sum(t, k, ls):
+    '''
+    Returns: the largest sum of k of the distances in ls that is at most t, or None
+    Small t goes to a bitset DP, and lists whose halves have few subsets of at
+    most k values to meet-in-the-middle, both bounded by their budgets. Other
+    cases (large n and t) seed branch-and-bound with the best balanced
+    meet-in-the-middle sum. That is exact, and quick when a sum hits t, but
+    exponential in the worst case, as proving a smaller optimum means
+    exhausting the pruned tree: with 60 values up to 1e9 and k=10 it takes
+    0.1s to 20s depending on t (see bench()).
+    '''
+    ls = list(ls)
+    n = len(ls)
+    if k < 0 or k > n:
+        return None
+    if k == 0:
+        return 0 if t >= 0 else None
+    if 0 <= t and min(ls) >= 0 and n * k * (t // 64 + 1) <= _DP_BUDGET:
+        return _bitset_dp(t, k, ls)
+    if sum(comb((n + 1) // 2, c) for c in range(k + 1)) <= _MITM_BUDGET:
+        return _meet_in_the_middle(t, k, ls)
+    # a good first sum lets branch-and-bound prune from the start
+    best = _split_bound(t, k, ls)
+    return best if best == t else _branch_and_bound(t, k, ls, best)
+
+
+class BestSumIndex(object):
+    '''
+    Answers choose_best_sum(t, k, ls) for many (t, k) over the same ls.
+    Builds once, for every count c <= max_k, a bitset of the sums of c values
+    up to max_sum (the total by default); a query masks the bitset to t and
+    takes its highest bit. When the bitsets would take more than memory_limit
+    bytes, or ls has negative values, queries go to choose_best_sum instead,
+    as do queries with t above a max_sum set below the total.
+    '''
+
+    def __init__(self, ls, max_k=None, max_sum=None, memory_limit=64 << 20):
+        self.ls = list(ls)
+        self.max_k = len(self.ls) if max_k is None else min(max_k, len(self.ls))
+        self.max_sum = sum(self.ls) if max_sum is None else max_sum
+        # with no negative values every sum is in the bitsets, so a larger t
+        # can be lowered to max_sum
+        self.__complete = self.max_sum >= sum(self.ls)
+        self.reach = None
+        if (not self.ls or min(self.ls) >= 0) and self.max_sum >= 0 and \
+                (self.max_k + 1) * (self.max_sum // 8 + 1) <= memory_limit:
+            self.reach = _reach_bitsets(self.ls, self.max_k, self.max_sum)
+
+    def choose_best_sum(self, t, k):
+        '''
+        Returns: the largest sum of k of the distances that is at most t, or None
+        '''
+        if self.reach is None or k > self.max_k or t > self.max_sum and not self.__complete:
+            return choose_best_sum(t, k, self.ls)
+        t = min(t, self.max_sum)
+        if k < 0 or t < 0:
+            return None
+        sums = self.reach[k] & (1 << t + 1) - 1
+        return sums.bit_length() - 1 if sums else None
+
+
+def bench(seed=1):
+    rng = random.Random(seed)
+    cases = [
+        ('n=20, k=5, small t', 20, 5, 1000, 300),
+        ('n=22, k=8, large t', 22, 8, 10 ** 9, 10 ** 8),
+        ('n=60, k=10, small t', 60, 10, 2000, 500),
+        ('n=60, k=10, large t', 60, 10, 3 * 10 ** 9, 10 ** 9),
+        ('n=60, k=3, large t', 60, 3, 10 ** 9, 10 ** 9),
+    ]
+    for name, n, k, t, high in cases:
+        ls = [rng.randint(1, high) for _ in range(n)]
+        start = time.perf_counter()
+        result = choose_best_sum(t, k, ls)
+        line = '{}: {} in {:.4f}s'.format(name, result, time.perf_counter() - start)
+        if comb(n, k) <= 10 ** 6:
+            start = time.perf_counter()
+            expected = _choose_best_sum_combinations(t, k, ls)
+            line += ', combinations {} in {:.4f}s'.format(expected, time.perf_counter() - start)
+        print(line)
+    # large n and t: quick when some sum hits t, slow when a smaller optimum must be proven
+    for t in (2 * 10 ** 9, 3 * 10 ** 9, 5000012345, 7777777777):
+        ls = [rng.randint(1, 10 ** 9) for _ in range(60)]
+        start = time.perf_counter()
+        result = choose_best_sum(t, 10, ls)
+        print('n=60, k=10, values up to 1e9, t={}: {} in {:.4f}s'.format(t, result, time.perf_counter() - start))
+    ls = [rng.randint(1, 500) for _ in range(60)]
+    queries = [(rng.randint(0, 5000), rng.randint(1, 10)) for _ in range(10000)]
+    start = time.perf_counter()
+    index = BestSumIndex(ls, max_k=10)
+    built = time.perf_counter() - start
+    answers = [index.choose_best_sum(t, k) for t, k in queries]
+    indexed = time.perf_counter() - start
+    start = time.perf_counter()
+    assert answers == [choose_best_sum(t, k, ls) for t, k in queries]
+    print('10000 queries, n=60: index {:.4f}s (build {:.4f}s), per query {:.4f}s'.format(
+        indexed, built, time.perf_counter() - start))
@@ -1,9 +1,112 @@
+import mmap
+import os
 import re
+from itertools import product
+from multiprocessing import Pool
+
+_NON_LETTER = re.compile(rb'[^a-zA-Z]')
+_LETTERS = b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+# translate() table turning everything but ASCII letters into spaces
+_SEPARATE = bytes(c if c in _LETTERS else 32 for c in range(256))
+# bytes counted per translate() and split(), bounding the memory used
+_BLOCK_SIZE = 1 << 22
+
+corner_words = ["a", "the", "on", "at", "of", "upon", "in", "as"]
+# every capitalisation of the corner words, so matches need no lower()
+_CORNER_WORDS = frozenset(
+    ''.join(letters).encode()
+    for word in corner_words
+    for letters in product(*((c.lower(), c.upper()) for c in word))
+)
+
+
+def _count(data, lo=0, hi=None):
+    '''
+    Returns: the number of words of data[lo:hi] that are not corner words,
+    data being bytes-like (an mmap included) and words runs of ASCII letters.
+    The range goes a block at a time, each block ending between two words.
+    '''
+    hi = len(data) if hi is None else hi
+    total = 0
+    while lo < hi:
+        end = min(lo + _BLOCK_SIZE, hi)
+        if end < hi:
+            match = _NON_LETTER.search(data, end, hi)
+            end = match.start() if match else hi
+        words = data[lo:end].translate(_SEPARATE).split()
+        total += len(words) - sum(map(_CORNER_WORDS.__contains__, words))
+        lo = end
+    return total
+
+
+def _to_bytes(text):
+    # non-ASCII characters can only separate words, one '?' each keeps that
+    return text.encode('ascii', 'replace') if isinstance(text, str) else text
+
+
 def word_count(s):
-    first_list = re.findall(r'[a-zA-Z]+', s)
-    final_list = []
-    corner_words = ["a", "the", "on", "at", "of", "upon", "in", "as"]
-    for e in first_list:
-        if e.lower() not in corner_words:
-            final_list.append(e)
-    return len(final_list)
\ No newline at end of file
+    return _count(_to_bytes(s))
+
+
+def _count_chunks(chunks):
+    '''
+    Counts over consecutive str or bytes chunks, holding back the letters at
+    the end of each chunk since the word may go on in the next one.
+    '''
+    total = 0
+    tail = b''
+    for chunk in chunks:
+        chunk = tail + _to_bytes(chunk)
+        head = chunk.rstrip(_LETTERS)
+        tail = chunk[len(head):]
+        total += _count(head)
+    return total + _count(tail)
+
+
+def _read_chunks(file, chunk_size):
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _shard_bounds(data, lo, hi):
+    # a word crossing a shard boundary belongs to the shard where it starts
+    size = len(data)
+    if 0 < lo < size and data[lo-1:lo].isalpha():
+        match = _NON_LETTER.search(data, lo)
+        lo = match.start() if match else size
+    if hi < size and data[hi-1:hi].isalpha():
+        match = _NON_LETTER.search(data, hi)
+        hi = match.start() if match else size
+    return lo, max(lo, hi)
+
+
+def _count_shard(task):
+    path, lo, hi = task
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return _count(data, *_shard_bounds(data, lo, hi))
+
+
+def word_count_stream(source, chunk_size=1 << 24, workers=None):
+    '''
+    word_count over data that need not fit in memory. source is a file path
+    (memory-mapped), a file object (read by chunk_size) or an iterable of str
+    or bytes chunks. With workers, a path is split into byte ranges that are
+    counted by that many processes.
+    Returns: the number of words that are not corner words
+    '''
+    if isinstance(source, (str, bytes, os.PathLike)):
+        size = os.path.getsize(source)
+        if size == 0:
+            return 0
+        if workers is None:
+            return _count_shard((source, 0, size))
+        step = -(-size // (workers * 4))
+        with Pool(workers) as pool:
+            return sum(pool.map(_count_shard, [(source, lo, min(lo + step, size))
+                                               for lo in range(0, size, step)]))
+    if hasattr(source, 'read'):
+        return _count_chunks(_read_chunks(source, chunk_size))
+    return _count_chunks(source)
@@ -1,2 +1,37 @@
+import operator
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# largest |n| for which n * (n * n + 1) still fits in int64
+_INT64_MAX_N = 2097151
+
+
 def cumulative_triangle(n):
-    return n*((n-1)*(n+1)+2)/2
\ No newline at end of file
+    return n*((n-1)*(n+1)+2)//2
+
+
+def cumulative_triangles(ns):
+    '''
+    cumulative_triangle for every n of ns (a NumPy array or any sequence of
+    integers), in one vectorised pass. The arithmetic is int64 while every |n|
+    is at most _INT64_MAX_N and exact Python ints (object dtype) otherwise.
+    Returns: a NumPy array, or a list without NumPy
+    '''
+    if np is None:
+        return [cumulative_triangle(n) for n in ns]
+    ns = np.asarray(ns)
+    if ns.size == 0:
+        return np.zeros(ns.shape, dtype=np.int64)
+    if ns.dtype == object:
+        # operator.index turns NumPy integers into ints and refuses floats
+        ns = np.vectorize(operator.index, otypes=[object])(ns)
+    elif ns.dtype.kind not in 'iu':
+        raise TypeError('cumulative_triangles() expects integers, got {}'.format(ns.dtype))
+    elif -_INT64_MAX_N <= int(ns.min()) and int(ns.max()) <= _INT64_MAX_N:
+        ns = ns.astype(np.int64)
+    else:
+        ns = ns.astype(object)
+    return ns*(ns*ns+1)//2
\ No newline at end of file
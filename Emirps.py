@@ -5,48 +5,280 @@
 # E.G: 13, 17 are prime numbers and the reversed respectively are 31, 71 which are also primes, so 13 and 17 are emirps
 # But see the cases, 757, 787, 797, these are palindromic primes, so they do not enter in the sequence.
 # Return: [number of emirps bellow n, largest emirp smaller than n, sum of all the emirps of the sequence bellow n]
+import mmap
+import struct
+import time
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from math import isqrt
+from multiprocessing import Pool, shared_memory
+
+# translate() tables setting bit b of every byte
+_SET_BIT = [bytes(x | (1 << b) for x in range(256)) for b in range(8)]
+# bit positions that are clear (prime) in each byte value
+_CLEAR_BITS = [tuple(b for b in range(8) if not x >> b & 1) for x in range(256)]
+
+
+def _small_primes(limit):
+    '''
+    Plain sieve, returns the primes <= limit.
+    '''
+    is_composite = bytearray(limit + 1)
+    primes = []
+    for i in range(2, limit + 1):
+        if not is_composite[i]:
+            primes.append(i)
+            is_composite[i*i::i] = b'\x01' * len(range(i*i, limit + 1, i))
+    return primes
+
+
+def _sieve_segment(base_primes, lo, hi):
+    '''
+    Sieves bytes lo..hi-1 of the odd-only bitmap: bit i stands for 2i+1 and is
+    set when that number is composite (1 is left clear).
+    The odd multiples of p are every p-th bit, so those with the same bit
+    position in their byte are every p-th byte and each of the 8 bit positions
+    is one translate() over a strided slice.
+    base_primes are the odd primes up to the square root of the range.
+    '''
+    segment = bytearray(hi - lo)
+    first_bit, end_bit = lo * 8, hi * 8
+    for p in base_primes:
+        # bit of the first odd multiple of p (from p*p on) inside the segment
+        start = max(p * p >> 1, first_bit + (p // 2 - first_bit) % p) - first_bit
+        for bit in range(start, min(start + 8 * p, end_bit - first_bit), p):
+            byte = bit >> 3
+            segment[byte::p] = segment[byte::p].translate(_SET_BIT[bit & 7])
+    return segment
+
+
+class PrimeBits(object):
+    '''
+    Primality table below limit, as an odd-only bit-packed sieve of Eratosthenes
+    built one segment at a time (limit / 16 bytes).
+    '''
+    SEGMENT_BYTES = 1 << 20
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.bits = bytearray((limit + 15) // 16)
+        base_primes = _small_primes(isqrt(limit))[1:]
+        for lo in range(0, len(self.bits), self.SEGMENT_BYTES):
+            hi = min(lo + self.SEGMENT_BYTES, len(self.bits))
+            self.bits[lo:hi] = _sieve_segment(base_primes, lo, hi)
+        if self.bits:
+            self.bits[0] |= 1
+
+    def is_prime(self, number):
+        if number % 2 == 0:
+            return number == 2
+        return 1 < number < self.limit and not self.bits[number >> 4] >> (number >> 1 & 7) & 1
+
+
+def _emirp_ranges(lo, hi):
+    '''
+    Splits [lo, hi) into the ranges that can hold emirps: two digits or more,
+    and a leading 1, 3, 7 or 9, since the reversal must not end in 2, 4, 5, 6, 8.
+    '''
+    power = 10
+    while power <= hi:
+        for lead in (1, 3, 7, 9):
+            a, b = max(lo, lead * power), min(hi, (lead + 1) * power)
+            if a < b:
+                yield a, b
+        power *= 10
+
+
+def _iter_emirps(bits, lo, hi):
+    '''
+    Yields the emirps in [lo, hi) in increasing order, bits being a PrimeBits
+    table covering every reversal.
+    '''
+    for a, b in _emirp_ranges(lo, hi):
+        for byte in range(a >> 4, (b - 1 >> 4) + 1):
+            for bit in _CLEAR_BITS[bits[byte]]:
+                number = byte * 16 + bit * 2 + 1
+                if number < a or number >= b:
+                    continue
+                digits = str(number)
+                reversed_digits = digits[::-1]
+                if reversed_digits == digits:
+                    continue
+                reverse = int(reversed_digits)
+                if reverse & 1 and not bits[reverse >> 4] >> (reverse >> 1 & 7) & 1:
+                    yield number
+
+
+def _scan_emirps(bits, lo, hi):
+    '''
+    Emirps in [lo, hi), as _iter_emirps but only keeping the totals.
+    Returns: [count, largest, sum]
+    '''
+    count = largest = total = 0
+    for number in _iter_emirps(bits, lo, hi):
+        count += 1
+        largest = number
+        total += number
+    return [count, largest, total]
+
+
+# what a pool worker sieves into and scans, filled in by _attach_shared
+_shared = {}
+
+
+def _attach_shared(bits_name, bits_size, primes_name, primes_count):
+    '''
+    Pool initializer mapping the parent's composite bitmap, which the sieve
+    phase writes and the scan phase reads, and the odd base primes (uint32)
+    that every segment is sieved with. The blocks are kept alongside their
+    views so they stay mapped for the life of the worker.
+    '''
+    bits_block = shared_memory.SharedMemory(name=bits_name)
+    primes_block = shared_memory.SharedMemory(name=primes_name)
+    _shared['blocks'] = (bits_block, primes_block)
+    _shared['bits'] = bits_block.buf[:bits_size]
+    _shared['primes'] = primes_block.buf.cast('I')[:primes_count]
+
+
+def _sieve_worker(byte_range):
+    lo, hi = byte_range
+    _shared['bits'][lo:hi] = _sieve_segment(_shared['primes'], lo, hi)
+
+
+def _scan_worker(number_range):
+    return _scan_emirps(_shared['bits'], *number_range)
+
+
+def _split(lo, hi, parts):
+    step = max(-(-(hi - lo) // parts), 1)
+    return [(a, min(a + step, hi)) for a in range(lo, hi, step)]
+
+
+def _sieve_limit(n):
+    # reversals of numbers below n have at most as many digits as n - 1
+    return 10 ** len(str(max(n - 1, 1)))
+
+
+class EmirpIndex(object):
+    '''
+    Every emirp below limit with the running sums, so that find_emirp(n) is a
+    binary search. Saved as a header (magic, limit, count) followed by the
+    count emirps and the count + 1 prefix sums as native uint64, and loaded by
+    mmap without copying.
+    '''
+    MAGIC = b'EMIRPIX1'
+    __HEADER = struct.Struct('=8sQQ')
+
+    def __init__(self, limit, emirps, prefix_sums, mapping=None):
+        self.limit = limit
+        self.emirps = emirps
+        self.prefix_sums = prefix_sums
+        self.__mapping = mapping
+
+    @classmethod
+    def build(cls, limit):
+        sieve = PrimeBits(_sieve_limit(limit))
+        emirps = array('Q', _iter_emirps(sieve.bits, 2, limit))
+        return cls(limit, emirps, array('Q', accumulate(emirps, initial=0)))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, limit, count = cls.__HEADER.unpack_from(mapping)
+        if magic != cls.MAGIC or len(mapping) != cls.__HEADER.size + (2 * count + 1) * 8:
+            mapping.close()
+            raise ValueError('{} is not an emirp index'.format(path))
+        values = memoryview(mapping)[cls.__HEADER.size:].cast('Q')
+        return cls(limit, values[:count], values[count:], mapping)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.__HEADER.pack(self.MAGIC, self.limit, len(self.emirps)))
+            f.write(memoryview(self.emirps).cast('B'))
+            f.write(memoryview(self.prefix_sums).cast('B'))
+
+    def close(self):
+        if self.__mapping is not None:
+            # the views must go before the mapping can be closed
+            self.emirps.release()
+            self.prefix_sums.release()
+            self.__mapping.close()
+            self.__mapping = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def find_emirp(self, n):
+        '''
+        Returns: [number of emirps below n, largest of them, their sum],
+        n being at most limit
+        '''
+        if n > self.limit:
+            raise ValueError('n={} is above the index limit {}'.format(n, self.limit))
+        count = bisect_left(self.emirps, n)
+        return [count, self.emirps[count - 1] if count else 0, self.prefix_sums[count]]
 
 
 class Emirps(object):
 
-    def __init__(self, n):
+    def __init__(self, n, workers=None, index=None):
         self.n = n
-
-    def __is_prime(self, number):
-        if number % 2 == 0 and number > 2:
-            return False
-        for i in range(3, int(number**0.5) + 1, 2):
-            if number % i == 0:
-                return False
-        return True
-
-    def __generate_primes(self):
-        dict = {}
-        primes = 2
-        while primes < self.n:
-            if primes not in dict:
-                yield primes
-                dict[primes * primes] = [primes]
-            else:
-                for num in dict[primes]:
-                    dict.setdefault(num + primes, []).append(num)
-                del dict[primes]
-            primes += 1
-
-    def __list_primes(self):
-        return [x for x in list(self.__generate_primes())
-                if self.__is_prime(int(str(x)[::-1])) and int(str(x)[::-1]) != x]
+        self.workers = workers
+        self.index = index
 
     def find_emirp(self):
-        final_list = []
-        primes_list = self.__list_primes()
-        for element in primes_list:
-            if element > self.n:
-                break
-            final_list.append(element)
-        if final_list:
-            return [len(final_list), sorted(final_list)[-1], sum(final_list)]
-        return [0, 0, 0]
-
-emirp = Emirps(500000)
-print emirp.find_emirp()
+        if self.index is not None and self.n <= self.index.limit:
+            return self.index.find_emirp(self.n)
+        limit = _sieve_limit(self.n)
+        if self.workers is None:
+            return _scan_emirps(PrimeBits(limit).bits, 2, self.n)
+        return self.__find_emirp_parallel(limit)
+
+    def __find_emirp_parallel(self, limit):
+        '''
+        Sieves the bitmap in segments across the worker processes, then has
+        each of them scan a range of [2, n) for emirps and reduces the partial
+        [count, largest, sum] results. The bitmap and the base primes live in
+        shared memory, only ranges and partial results are pickled.
+        '''
+        size = (limit + 15) // 16
+        base_primes = array('I', _small_primes(isqrt(limit))[1:])
+        bits_block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        primes_block = shared_memory.SharedMemory(create=True, size=max(len(base_primes), 1) * 4)
+        try:
+            primes_block.buf[:len(base_primes) * 4] = memoryview(base_primes).cast('B')
+            with Pool(self.workers, _attach_shared,
+                      (bits_block.name, size, primes_block.name, len(base_primes))) as pool:
+                pool.map(_sieve_worker, [
+                    (lo, min(lo + PrimeBits.SEGMENT_BYTES, size))
+                    for lo in range(0, size, PrimeBits.SEGMENT_BYTES)
+                ])
+                if size:
+                    bits_block.buf[0] |= 1
+                partials = pool.map(_scan_worker, _split(2, self.n, self.workers * 8))
+        finally:
+            for block in (bits_block, primes_block):
+                block.close()
+                block.unlink()
+
+        count = sum(p[0] for p in partials)
+        largest = max([p[1] for p in partials] or [0])
+        total = sum(p[2] for p in partials)
+        return [count, largest, total]
+
+
+def bench_workers(n=10**8, workers=(None, 1, 2, 4)):
+    for count in workers:
+        start = time.perf_counter()
+        result = Emirps(n, count).find_emirp()
+        print('workers={}: {} in {:.2f}s'.format(count or 'serial', result, time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    emirp = Emirps(500000)
+    print(emirp.find_emirp())
@@ -1,4 +1,8 @@
-def smallest(n):
+import random
+import time
+
+
+def _smallest_brute_force(n):
 
     result = [n, 0, 0]
 
@@ -12,3 +16,82 @@ def smallest(n):
                 result = [test, x, y]
             backup_list.pop(y)
     return result
+
+
+def _moved_window(digits, x, y, lo, hi):
+    '''
+    Returns: digits[lo:hi+1] after moving digits[x] to index y,
+    with lo <= min(x, y) and max(x, y) <= hi
+    '''
+    if y <= x:
+        return digits[lo:y] + digits[x] + digits[y:x] + digits[x+1:hi+1]
+    return digits[lo:x] + digits[x+1:y+1] + digits[x] + digits[y+1:hi+1]
+
+
+def _best_moves(digits):
+    '''
+    Yields, for every removal index x, the smallest insertion index y giving
+    the smallest number: in front of the first remaining digit greater than
+    digits[x], moved back over the run of digits equal to it.
+    '''
+    size = len(digits)
+    run_start = list(range(size))
+    for i in range(1, size):
+        if digits[i] == digits[i-1]:
+            run_start[i] = run_start[i-1]
+    first_greater = {}
+    for c in '0123456789':
+        first_greater[c] = next((i for i, d in enumerate(digits) if d > c), size)
+    for x, c in enumerate(digits):
+        j = first_greater[c]
+        k = run_start[j-1] if j and digits[j-1] == c else j
+        yield x, k if k <= x else k - 1
+
+
+def smallest(n):
+    '''
+    Moves one digit of n to get the smallest number.
+    Returns: [smallest number, index taken from, index inserted at], the
+    indices as small as possible, or [n, 0, 0] when no move makes n smaller.
+    Only the best insertion for each removal is a candidate, and two
+    candidates only differ where either moved a digit, so they are compared
+    on that window alone.
+    '''
+    digits = str(n)
+    best_x = best_y = None
+    for x, y in _best_moves(digits):
+        if best_x is None:
+            best_x, best_y = x, y
+            continue
+        lo, hi = min(x, y, best_x, best_y), max(x, y, best_x, best_y)
+        if _moved_window(digits, x, y, lo, hi) < _moved_window(digits, best_x, best_y, lo, hi):
+            best_x, best_y = x, y
+    if best_x is None:
+        return [n, 0, 0]
+    lo, hi = min(best_x, best_y), max(best_x, best_y)
+    window = _moved_window(digits, best_x, best_y, lo, hi)
+    if window >= digits[lo:hi+1]:
+        return [n, 0, 0]
+    return [int(digits[:lo] + window + digits[hi+1:]), best_x, best_y]
+
+
+def smallest_batch(numbers):
+    '''
+    Returns: [smallest(n) for n in numbers], numbers being any iterable of
+    non-negative integers, NumPy arrays included
+    '''
+    return [smallest(int(n)) for n in numbers]
+
+
+def bench(seed=1):
+    rng = random.Random(seed)
+    for digit_count, count, compare in ((20, 1000, True), (1000, 20, False)):
+        numbers = [rng.randrange(10 ** (digit_count - 1), 10 ** digit_count) for _ in range(count)]
+        start = time.perf_counter()
+        results = smallest_batch(numbers)
+        line = '{} numbers of {} digits: {:.4f}s'.format(count, digit_count, time.perf_counter() - start)
+        if compare:
+            start = time.perf_counter()
+            assert results == [_smallest_brute_force(n) for n in numbers]
+            line += ', brute force {:.4f}s'.format(time.perf_counter() - start)
+        print(line)
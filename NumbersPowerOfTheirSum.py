@@ -1,23 +1,49 @@
-global_list = []
+import heapq
+from itertools import count
 
+_DIGIT_WEIGHTS = tuple((str(d), d) for d in range(1, 10))
 
-def build_list():
-    global global_list
-    for number in range(2, 500):
-        for power in range(2, 50):
-            test_power = number ** power
-            sum = 0
-            sum_gen = test_power
-            while sum_gen > 0:
-                sum += sum_gen % 10
-                sum_gen //= 10
-            if sum == number:
-                global_list.append(test_power)
-    print sorted(global_list)
 
-build_list()
-global_list = sorted(global_list)
+def _digit_sum(number):
+    digits = str(number)
+    return sum(d * digits.count(c) for c, d in _DIGIT_WEIGHTS)
+
+
+def _lower_bound(base):
+    # a power with D digits has a digit sum of at most 9 * D, so a power of
+    # base can only qualify from ceil(base / 9) digits on
+    return max(base * base, 10 ** (-(-base // 9) - 1))
+
+
+def power_sum_dig_terms():
+    '''
+    Yields, in increasing order and without end, the numbers that are a power
+    (>= 2) of the sum of their digits.
+    The heap holds the next candidate power of every base that can have
+    reached the heap top; bases come in lazily in order of _lower_bound.
+    '''
+    heap = []
+    bases = count(2)
+    next_base = next(bases)
+    while True:
+        while not heap or _lower_bound(next_base) <= heap[0][0]:
+            power = 2
+            while next_base ** power < _lower_bound(next_base):
+                power += 1
+            heapq.heappush(heap, (next_base ** power, next_base))
+            next_base = next(bases)
+        value, base = heap[0]
+        heapq.heapreplace(heap, (value * base, base))
+        # the digit sum is congruent to the number mod 9
+        if value % 9 == base % 9 and _digit_sum(value) == base:
+            yield value
+
+
+_terms = []
+_term_source = power_sum_dig_terms()
 
 
 def power_sumDigTerm(n):
-    return global_list[n-1]
\ No newline at end of file
+    while len(_terms) < n:
+        _terms.append(next(_term_source))
+    return _terms[n-1]
@@ -1,4 +1,60 @@
-def reverse(string):
-    if len(string) == 1:
+import mmap
+import os
+
+
+def _reverse_in_place(buffer, block_size):
+    '''
+    Reverses a writable memoryview or mmap by swapping blocks from both ends,
+    each reversed on its way, using two blocks of extra memory.
+    '''
+    if isinstance(buffer, memoryview):
+        def flip(data):
+            return memoryview(data).cast(buffer.format)[::-1]
+    else:
+        def flip(data):
+            return data[::-1]
+    lo, hi = 0, len(buffer)
+    while hi - lo > 1:
+        size = min(block_size, (hi - lo) // 2)
+        left = bytes(buffer[lo:lo+size])
+        right = bytes(buffer[hi-size:hi])
+        buffer[lo:lo+size] = flip(right)
+        buffer[hi-size:hi] = flip(left)
+        lo += size
+        hi -= size
+    return buffer
+
+
+def _readonly(buffer):
+    with memoryview(buffer) as view:
+        return view.readonly
+
+
+def reverse(string, block_size=1 << 20):
+    '''
+    Returns: string reversed, a new object for str, bytes and other sequences,
+    while bytearray and writable memoryview and mmap buffers are reversed in
+    place; read-only ones give their bytes reversed item by item
+    '''
+    if isinstance(string, bytearray):
+        string.reverse()
         return string
-    return string[-1] + reverse(string[:-1])
\ No newline at end of file
+    if isinstance(string, (memoryview, mmap.mmap)):
+        if _readonly(string):
+            return memoryview(string)[::-1].tobytes()
+        return _reverse_in_place(string, block_size)
+    return string[::-1]
+
+
+def reverse_file(source, target, block_size=1 << 20):
+    '''
+    Writes the bytes of the file source in reverse order to the file target,
+    reading source a block at a time from its end.
+    '''
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        position = src.seek(0, os.SEEK_END)
+        while position:
+            size = min(block_size, position)
+            position -= size
+            src.seek(position)
+            dst.write(src.read(size)[::-1])
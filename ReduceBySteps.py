@@ -1,4 +1,9 @@
-from functools import reduce
+from itertools import accumulate
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def gcdi(a, b):
@@ -23,5 +28,50 @@ def mini(a, b):
     return min(a, b)
 
 
+# shorter arrays are not worth converting to NumPy
+_NUMPY_MIN_SIZE = 256
+# magnitude bound keeping every operation's inputs and results inside int64
+_INT64_BOUND = 1 << 62
+
+
+def _numpy_ufunc(fct, values):
+    '''
+    Returns: the ufunc whose accumulate gives the same scan as fct over values
+    (init first), or None when fct is not one of ours or int64 could overflow
+    or differ from the Python result.
+    '''
+    if any(type(v) is not int or not -_INT64_BOUND < v < _INT64_BOUND for v in values):
+        return None
+    if fct is maxi:
+        return np.maximum
+    if fct is mini:
+        return np.minimum
+    if fct is gcdi:
+        return np.gcd
+    if fct is som and max(abs(v) for v in values).bit_length() + len(values).bit_length() < 63:
+        return np.add
+    # the lcm is at most the product; lcmu fails on two zeros in a row,
+    # which the Python path reports the same way
+    if fct is lcmu and sum(abs(v).bit_length() for v in values) < 63 and 0 not in values:
+        return np.lcm
+    return None
+
+
+def iter_oper_array(fct, iterable, init):
+    '''
+    Streaming oper_array: yields fct(...fct(fct(init, a0), a1)..., ai) for every
+    ai of iterable, holding only the running value.
+    '''
+    scan = accumulate(iterable, fct, initial=init)
+    next(scan)
+    return scan
+
+
 def oper_array(fct, arr, init):
-    return [reduce(fct, arr[:i], init) for i in range(1, len(arr)+1)]
+    if np is not None and len(arr) >= _NUMPY_MIN_SIZE and fct in (som, maxi, mini, gcdi, lcmu):
+        values = [init]
+        values.extend(arr)
+        ufunc = _numpy_ufunc(fct, values)
+        if ufunc is not None:
+            return ufunc.accumulate(np.array(values, dtype=np.int64))[1:].tolist()
+    return list(iter_oper_array(fct, arr, init))
@@ -1,14 +1,42 @@
-def find_secret_message(paragraph):
-    paragraph = paragraph.translate(None, ',.:!?')
-    paragraph = [x.lower() for x in paragraph.split(' ')]
+_PUNCTUATION = str.maketrans('', '', ',.:!?')
+
+
+def _read_chunks(file, chunk_size):
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
 
-    final_string = []
+def find_secret_message_stream(source, chunk_size=1 << 16):
+    '''
+    find_secret_message over text given as an iterable of str chunks or a
+    file object (read by chunk_size). The part after the last space of a
+    chunk is carried over to the next one, so words are split exactly as
+    split(' ') on the whole text would. Memory grows with the vocabulary only.
+    Returns: the words seen a second time, in that order, joined by spaces
+    '''
+    if hasattr(source, 'read'):
+        source = _read_chunks(source, chunk_size)
     secret = set()
+    final_words = {}
+    tail = ''
+    for chunk in source:
+        words = (tail + chunk.translate(_PUNCTUATION)).split(' ')
+        tail = words.pop()
+        for e in words:
+            e = e.lower()
+            if e not in secret:
+                secret.add(e)
+            elif e not in final_words:
+                final_words[e] = None
+    e = tail.lower()
+    if e in secret:
+        final_words.setdefault(e)
 
-    for e in paragraph:
-        if e not in secret:
-            secret.add(e)
-        elif e not in final_string:
-            final_string.append(e)
-        
-    return ' '.join(final_string)
\ No newline at end of file
+    return ' '.join(final_words)
+
+
+def find_secret_message(paragraph):
+    return find_secret_message_stream((paragraph,))
@@ -1,7 +1,11 @@
-def decrypt(encrypted_text, n):
-    if encrypted_text is None:
-        return None
-        
+from functools import lru_cache
+from operator import itemgetter
+
+# up to this many rounds the slicing loops beat building the permutation
+_LOOP_ROUNDS = 4
+
+
+def _decrypt_rounds(encrypted_text, n):
     new_text = encrypted_text
     ch_list = list(encrypted_text)
     for i in range(n):
@@ -10,8 +14,70 @@ def decrypt(encrypted_text, n):
         new_text = ''.join(ch_list)
     return new_text
 
-def encrypt(text, n):
+
+def _encrypt_rounds(text, n):
     new_text = text
     for i in range(n):
         new_text = new_text[1::2] + new_text[0::2]
-    return new_text
\ No newline at end of file
+    return new_text
+
+
+@lru_cache(maxsize=64)
+def _cycles(length):
+    '''
+    Cycle decomposition of one encryption round on a text of this length:
+    each cycle lists positions i, source(i), source(source(i)), ... where
+    the round moves the character at source(i) to i.
+    '''
+    source = list(range(1, length, 2)) + list(range(0, length, 2))
+    seen = bytearray(length)
+    cycles = []
+    for start in range(length):
+        if not seen[start]:
+            cycle = []
+            i = start
+            while not seen[i]:
+                seen[i] = 1
+                cycle.append(i)
+                i = source[i]
+            cycles.append(cycle)
+    return cycles
+
+
+def _permute(text, n):
+    '''
+    Applies n encryption rounds (decryption ones if n < 0) in one pass, each
+    cycle being rotated by n modulo its length.
+    Works on str, bytes and bytearray, returning the same type.
+    '''
+    if len(text) < 2:
+        return text
+    order = [0] * len(text)
+    for cycle in _cycles(len(text)):
+        k = n % len(cycle)
+        for i, source in zip(cycle, cycle[k:] + cycle[:k]):
+            order[i] = source
+    characters = itemgetter(*order)(text)
+    if isinstance(text, str):
+        return ''.join(characters)
+    return type(text)(characters)
+
+
+def decrypt(encrypted_text, n):
+    if encrypted_text is None:
+        return None
+    if n <= 0:
+        return encrypted_text
+    if n <= _LOOP_ROUNDS and isinstance(encrypted_text, str):
+        return _decrypt_rounds(encrypted_text, n)
+    return _permute(encrypted_text, -n)
+
+
+def encrypt(text, n):
+    if text is None:
+        return None
+    if n <= 0:
+        return text
+    if n <= _LOOP_ROUNDS:
+        return _encrypt_rounds(text, n)
+    return _permute(text, n)
@@ -1,15 +1,24 @@
 
 import sys
 import math
+import time
+import tracemalloc
+import keyword
+from collections import OrderedDict, namedtuple
 
-from PyQt5.QtCore import Qt
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from PyQt5.QtCore import Qt, QPointF
 from PyQt5.QtWidgets import (
     QApplication,
     QWidget, QFrame,
     QPushButton,
     QGridLayout
 )
-from PyQt5.QtGui import QPainter, QColor, QPen
+from PyQt5.QtGui import QPainter, QColor, QPen, QPolygonF
 
 
 class ExprException(Exception):
@@ -17,17 +26,47 @@ class ExprException(Exception):
 
 
 class _Node:
+    # expression trees get big (differentiation, long inputs), so nodes carry
+    # no __dict__ and no per-instance function references
+    __slots__ = ()
+    children = ()
+
     def copy(self):
-        raise NotImplemented('abstract method')
+        return _copy(self)
 
     def eval(self):
-        raise NotImplemented('abstract method')
+        return _eval(self)
 
     def differentiate(self):
-        raise NotImplemented('abstract method')
+        return _differentiate(self)
+
+    def dump(self, indent=0):
+        return _dump(self, indent)
+
+    def _copy_with(self, children):
+        '''
+        Returns a node like this one with the given (already copied) children.
+        '''
+        raise NotImplementedError('abstract method')
 
-    def dump(self, indent):
-        raise NotImplemented('abstract method')
+    def _evaluate(self, args):
+        '''
+        Value of this node, given the values of its children.
+        '''
+        raise NotImplementedError('abstract method')
+
+    def _derive(self, d):
+        '''
+        Derivative rule of this node, d(child) gives the derivative of a child.
+        Subtrees are shared rather than copied, nodes are never modified.
+        '''
+        raise NotImplementedError('abstract method')
+
+    def _label(self):
+        '''
+        Line of dump() output for this node, without indent.
+        '''
+        raise NotImplementedError('abstract method')
 
 
 class _OpNode(_Node):
@@ -39,79 +78,90 @@ class _OpNode(_Node):
         '^': lambda x, y: x**y
     }
 
+    __slots__ = ('op', 'left', 'right')
+
     def __init__(self, op, left, right):
+        if op not in self.__OPS:
+            raise KeyError(op)
         self.op = op
-        self.func = self.__OPS[op]
         self.left = left
         self.right = right
 
-    def eval(self):
-        return self.func(self.left.eval(), self.right.eval())
+    @property
+    def func(self):
+        return self.__OPS[self.op]
 
-    def copy(self):
-        return _OpNode(self.op, self.left.copy(), self.right.copy())
+    @property
+    def children(self):
+        return (self.left, self.right)
 
-    def differentiate(self):
+    def _evaluate(self, args):
+        return self.func(*args)
+
+    def _copy_with(self, children):
+        return _OpNode(self.op, *children)
+
+    def _derive(self, d):
         if self.op == '+':
-            return _OpNode('+', self.left.differentiate(), self.right.differentiate())
+            return _OpNode('+', d(self.left), d(self.right))
         elif self.op == '-':
-            return _OpNode('-', self.left.differentiate(), self.right.differentiate())
+            return _OpNode('-', d(self.left), d(self.right))
         elif self.op == '*':
             return _OpNode(
                 '+',
-                _OpNode('*', self.left.differentiate(), self.right.copy()),
-                _OpNode('*', self.left.copy(), self.right.differentiate())
+                _OpNode('*', d(self.left), self.right),
+                _OpNode('*', self.left, d(self.right))
             )
         elif self.op == '/':
             return _OpNode(
                '/',
                _OpNode(
                     '-',
-                    _OpNode('*', self.left.differentiate(), self.right.copy()),
-                    _OpNode('*', self.left.copy(), self.right.differentiate())
+                    _OpNode('*', d(self.left), self.right),
+                    _OpNode('*', self.left, d(self.right))
                 ),
-               _OpNode('*', self.right.copy(), self.right.copy())
+               _OpNode('*', self.right, self.right)
             )
         elif self.op == '^':
             return _OpNode(
                 '*',
-                _OpNode('^', self.left.copy(), self.right.copy()),
+                _OpNode('^', self.left, self.right),
                 _OpNode(
                     '+',
                     _OpNode(
                         '*',
-                        self.right.differentiate(),
-                        _FuncNode('log', [self.left.copy(), _ConstNode(math.e)])
+                        d(self.right),
+                        _FuncNode('log', [self.left, _ConstNode(math.e)])
                     ),
                     _OpNode(
                         '/',
-                        _OpNode('*', self.right.copy(), self.left.differentiate()),
-                        self.left.copy()
+                        _OpNode('*', self.right, d(self.left)),
+                        self.left
                     )
                 )
             )
 
-    def dump(self, indent=0):
-        left = self.left.dump(indent+1)
-        right = self.right.dump(indent+1)
-        return '{}{}\n{}\n{}'.format('  '*indent, self.op, left, right)
+    def _label(self):
+        return self.op
 
 
 class _ConstNode(_Node):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
-    def copy(self):
+    def _copy_with(self, children):
         return _ConstNode(self.value)
 
-    def eval(self):
+    def _evaluate(self, args):
         return self.value
 
-    def differentiate(self):
+    def _derive(self, d):
         return _ConstNode(0)
 
-    def dump(self, indent=0):
-        return '{}{}'.format('  '*indent, self.value)
+    def _label(self):
+        return '{}'.format(self.value)
 
 
 class _FuncNode(_Node):
@@ -123,28 +173,35 @@ class _FuncNode(_Node):
         'log': lambda x, y: math.log(x, y)
     }
 
+    __slots__ = ('func_name', 'children')
+
     def __init__(self, func_name, children):
+        if func_name not in self.FUNCTIONS:
+            raise KeyError(func_name)
         self.func_name = func_name
-        self.func = self.FUNCTIONS[func_name]
-        self.children = children
+        self.children = tuple(children)
 
-    def copy(self):
-        return _FuncNode(self.func_name, [c.copy() for c in self.children])
+    @property
+    def func(self):
+        return self.FUNCTIONS[self.func_name]
 
-    def eval(self):
+    def _copy_with(self, children):
+        return _FuncNode(self.func_name, children)
+
+    def _evaluate(self, args):
         try:
-            return self.func(*[c.eval() for c in self.children])
+            return self.func(*args)
         except TypeError:
             raise ExprException('{}: function arity is wrong'.format(self.func_name))
 
-    def differentiate(self):
+    def _derive(self, d):
         if self.func_name == 'sin':
-            return _FuncNode('cos', [c.differentiate() for c in self.children])
+            return _FuncNode('cos', [d(c) for c in self.children])
         elif self.func_name == 'cos':
             return _OpNode(
                 '-',
                 _ConstNode(0),
-                _FuncNode('sin', [c.differentiate() for c in self.children])
+                _FuncNode('sin', [d(c) for c in self.children])
             )
         elif self.func_name == 'tan':
             return _OpNode(
@@ -152,15 +209,15 @@ class _FuncNode(_Node):
                 _ConstNode(1),
                 _OpNode(
                     '^',
-                    _FuncNode('cos', [c.differentiate() for c in self.children]),
+                    _FuncNode('cos', [d(c) for c in self.children]),
                     _ConstNode(2)
                 )
             )
         elif self.func_name == 'exp':
             return _OpNode(
                 '*',
-                _FuncNode('exp', [c.differentiate() for c in self.children]),
-                self.children[0].differentiate()
+                _FuncNode('exp', [d(c) for c in self.children]),
+                d(self.children[0])
             )
         elif self.func_name == 'log':
             return _OpNode(
@@ -169,55 +226,360 @@ class _FuncNode(_Node):
                     '-',
                     _OpNode(
                         '*',
-                        _FuncNode('log', [self.children[1].copy(), _ConstNode(math.e)]),
+                        _FuncNode('log', [self.children[1], _ConstNode(math.e)]),
                         _OpNode(
                             '/',
-                            self.children[0].differentiate(),
-                            self.children[0].copy()
+                            d(self.children[0]),
+                            self.children[0]
                         )
                     ),
                     _OpNode(
                         '*',
-                        _FuncNode('log', [self.children[0].copy(), _ConstNode(math.e)]),
+                        _FuncNode('log', [self.children[0], _ConstNode(math.e)]),
                         _OpNode(
                             '/',
-                            self.children[1].differentiate(),
-                            self.children[1].copy()
+                            d(self.children[1]),
+                            self.children[1]
                         )
                     )
                 ),
                 _OpNode(
                     '^',
-                    _FuncNode('log', [self.children[1].copy(), _ConstNode(math.e)]),
+                    _FuncNode('log', [self.children[1], _ConstNode(math.e)]),
                     _ConstNode(2)
                 )
             )
 
-    def dump(self, indent=0):
-        return '{}{}()\n{}'.format(
-            '  ' * indent,
-            self.func_name,
-            '\n'.join(c.dump(indent+1) for c in self.children)
-        )
+    def _label(self):
+        return '{}()'.format(self.func_name)
 
 
 class _VarNode(_Node):
+    __slots__ = ('variable',)
+
     def __init__(self, variable):
         self.variable = variable
 
-    def copy(self):
+    def _copy_with(self, children):
         return _VarNode(self.variable)
 
-    def eval(self):
+    def _evaluate(self, args):
         return float(input('Who is %s: ' % self.variable))
 
-    def differentiate(self):
+    def _derive(self, d):
         if self.variable == 'x':
             return _ConstNode(1)
         return _ConstNode(0)
 
-    def dump(self, indent=0):
-        return '{}{}'.format('  '*indent, self.variable)
+    def _label(self):
+        return self.variable
+
+
+def _postorder(root):
+    '''
+    Iterates the distinct nodes reachable from root, children before parents.
+    Shared subtrees are yielded only once.
+    '''
+    seen = set()
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+        elif id(node) not in seen:
+            seen.add(id(node))
+            stack.append((node, True))
+            for c in reversed(node.children):
+                stack.append((c, False))
+
+
+# The passes below use explicit stacks rather than recursion, so trees of any
+# depth work, and they handle shared subtrees (DAGs) by working per distinct node.
+
+def _eval(root):
+    values = {}
+    for node in _postorder(root):
+        values[id(node)] = node._evaluate([values[id(c)] for c in node.children])
+    return values[id(root)]
+
+
+def _copy(root):
+    copies = {}
+    for node in _postorder(root):
+        copies[id(node)] = node._copy_with([copies[id(c)] for c in node.children])
+    return copies[id(root)]
+
+
+def _dump(root, indent=0):
+    lines = []
+    stack = [(root, indent)]
+    while stack:
+        node, indent = stack.pop()
+        lines.append('  ' * indent + node._label())
+        if isinstance(node, _FuncNode) and not node.children:
+            lines.append('')
+        for c in reversed(node.children):
+            stack.append((c, indent+1))
+    return '\n'.join(lines)
+
+
+def _differentiate(root):
+    derivatives = {}
+    d = lambda node: derivatives[id(node)]
+    for node in _postorder(root):
+        derivatives[id(node)] = node._derive(d)
+    return derivatives[id(root)]
+
+
+def _is_const(node, value):
+    return isinstance(node, _ConstNode) and node.value == value
+
+
+def _fold(func, children):
+    '''
+    Evaluates func over constant children.
+    Returns: a _ConstNode, or None if the result is not a real number
+    '''
+    try:
+        value = func(*[c.value for c in children])
+    except (ArithmeticError, ValueError, TypeError):
+        return None
+    if isinstance(value, (int, float)):
+        return _ConstNode(value)
+    return None
+
+
+def _simplify_op(op, left, right):
+    if op == '+':
+        if _is_const(left, 0):
+            return right
+        if _is_const(right, 0):
+            return left
+    elif op == '-':
+        if _is_const(right, 0):
+            return left
+    elif op == '*':
+        if _is_const(left, 0) or _is_const(right, 1):
+            return left
+        if _is_const(right, 0) or _is_const(left, 1):
+            return right
+    elif op == '/':
+        if _is_const(left, 0) or _is_const(right, 1):
+            return left
+    elif op == '^':
+        if _is_const(right, 1) or _is_const(left, 1):
+            return left
+        if _is_const(right, 0):
+            return _ConstNode(1)
+    return None
+
+
+def _simplify(root):
+    '''
+    Constant folding and elimination of identities such as x+0, x*1, x*0, x^1.
+    Nodes whose children did not change are reused as they are.
+    '''
+    simplified = {}
+    for node in _postorder(root):
+        children = [simplified[id(c)] for c in node.children]
+        new = None
+        if children and all(isinstance(c, _ConstNode) for c in children):
+            new = _fold(node.func, children)
+        if new is None and isinstance(node, _OpNode):
+            new = _simplify_op(node.op, *children)
+
+        if new is None:
+            if all(new_c is c for new_c, c in zip(children, node.children)):
+                new = node
+            elif isinstance(node, _OpNode):
+                new = _OpNode(node.op, *children)
+            else:
+                new = _FuncNode(node.func_name, children)
+        simplified[id(node)] = new
+    return simplified[id(root)]
+
+
+def _intern(root):
+    '''
+    Common subexpression elimination: hash-conses the tree into a DAG in which
+    structurally equal subtrees are the same node object.
+    '''
+    table = {}
+    interned = {}
+    for node in _postorder(root):
+        children = [interned[id(c)] for c in node.children]
+        if isinstance(node, _ConstNode):
+            key = ('const', type(node.value), node.value)
+        elif isinstance(node, _VarNode):
+            key = ('var', node.variable)
+        elif isinstance(node, _OpNode):
+            key = ('op', node.op) + tuple(id(c) for c in children)
+        else:
+            key = ('func', node.func_name) + tuple(id(c) for c in children)
+
+        if key not in table:
+            if all(new_c is c for new_c, c in zip(children, node.children)):
+                table[key] = node
+            elif isinstance(node, _OpNode):
+                table[key] = _OpNode(node.op, *children)
+            else:
+                table[key] = _FuncNode(node.func_name, children)
+        interned[id(node)] = table[key]
+    return interned[id(root)]
+
+
+def _count_nodes(root):
+    '''
+    Returns: (distinct nodes, nodes of the tree with every shared subtree expanded)
+    '''
+    sizes = {}
+    for node in _postorder(root):
+        sizes[id(node)] = 1 + sum(sizes[id(c)] for c in node.children)
+    return len(sizes), sizes[id(root)]
+
+
+def _variables(root):
+    return sorted({n.variable for n in _postorder(root) if isinstance(n, _VarNode)})
+
+
+_SCALAR_OPS = {
+    '+': '{} + {}',
+    '-': '{} - {}',
+    '*': '{} * {}',
+    '/': '{} / {}',
+    '^': '{} ** {}'
+}
+
+_SCALAR_FUNCTIONS = {
+    'sin': math.sin,
+    'cos': math.cos,
+    'tan': math.tan,
+    'exp': math.exp,
+    'log': math.log
+}
+
+
+_ARRAY_OPS = {
+    '+': '_np.add({}, {})',
+    '-': '_np.subtract({}, {})',
+    '*': '_np.multiply({}, {})',
+    '/': '_np.true_divide({}, {})',
+    '^': '_np.power({}, {})'
+}
+
+if np is not None:
+    _ARRAY_FUNCTIONS = {
+        'sin': np.sin,
+        'cos': np.cos,
+        'tan': np.tan,
+        'exp': np.exp,
+        'log': lambda x, y: np.log(x) / np.log(y)
+    }
+
+
+def _codegen(root, params, ops, functions, const=repr):
+    '''
+    Generates a straight-line python function evaluating the tree rooted at root.
+    Every inner node is assigned to its own local, so the generated source is
+    flat no matter how deep the tree is, and shared subtrees are computed once.
+    Returns: the function object, taking params as arguments
+    '''
+    for name in params:
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ExprException('{}: cannot be used as a variable name'.format(name))
+
+    namespace = {'__builtins__': {}, '_np': np}
+    exprs = {}
+    lines = []
+    for node in _postorder(root):
+        if isinstance(node, _ConstNode):
+            if isinstance(node.value, (int, float)) and math.isfinite(node.value):
+                exprs[id(node)] = '({})'.format(const(node.value))
+            else:
+                exprs[id(node)] = '_k{}'.format(len(namespace))
+                namespace[exprs[id(node)]] = node.value
+            continue
+        if isinstance(node, _VarNode):
+            if node.variable not in params:
+                raise ExprException('{}: variable is not bound'.format(node.variable))
+            exprs[id(node)] = node.variable
+            continue
+
+        if isinstance(node, _OpNode):
+            value = ops[node.op].format(exprs[id(node.left)], exprs[id(node.right)])
+        else:
+            arity = _FuncNode.FUNCTIONS[node.func_name].__code__.co_argcount
+            if len(node.children) != arity:
+                raise ExprException('{}: function arity is wrong'.format(node.func_name))
+            namespace['_' + node.func_name] = functions[node.func_name]
+            value = '_{}({})'.format(node.func_name, ', '.join(exprs[id(c)] for c in node.children))
+        exprs[id(node)] = '_t{}'.format(len(lines))
+        lines.append('    {} = {}'.format(exprs[id(node)], value))
+
+    source = 'def _expr({}):\n{}\n    return {}\n'.format(
+        ', '.join(params),
+        ''.join(line + '\n' for line in lines),
+        exprs[id(root)]
+    )
+    exec(compile(source, '<expression>', 'exec'), namespace)
+    return namespace['_expr']
+
+
+class _TreeEntry:
+    '''
+    A parsed tree along with what has been computed from it so far.
+    Trees are never modified once built, so entries can be shared freely.
+    '''
+    def __init__(self, root):
+        self.root = root
+        self.derivative = None
+        self.compiled = {}
+        self.array_func = None
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class _ParseCache:
+    '''
+    LRU cache of _TreeEntry keyed by the expression's tuple of tokens.
+    '''
+    def __init__(self, maxsize):
+        self.__maxsize = maxsize
+        self.__entries = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self, key):
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.__misses += 1
+        else:
+            self.__hits += 1
+            self.__entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.__entries[key] = entry
+        self.__evict()
+
+    def resize(self, maxsize):
+        if maxsize < 0:
+            raise ValueError('cache size must not be negative')
+        self.__maxsize = maxsize
+        self.__evict()
+
+    def clear(self):
+        self.__entries.clear()
+        self.__hits = 0
+        self.__misses = 0
+
+    def info(self):
+        return CacheInfo(self.__hits, self.__misses, self.__maxsize, len(self.__entries))
+
+    def __evict(self):
+        while len(self.__entries) > self.__maxsize:
+            self.__entries.popitem(last=False)
 
 
 class ExpressionTree:
@@ -226,20 +588,40 @@ class ExpressionTree:
         '/': 10, '*': 10,
         '^': 20
     }
-    __PAREN_OFFSETS = {
-        '(': 50,
-        ')': -50
-    }
     __KNOWN_CONSTANTS = {
         'pi': math.pi,
         'e': math.e
     }
 
+    __cache = _ParseCache(256)
+
     def __init__(self, expr):
-        if isinstance(expr, _Node):
-            self.__root = expr
+        if isinstance(expr, _TreeEntry):
+            self.__entry = expr
+        elif isinstance(expr, _Node):
+            self.__entry = _TreeEntry(expr)
         else:
-            self.__root = self.__build(expr)
+            tokens = tuple(self.__tokenize(expr))
+            self.__entry = self.__cache.get(tokens)
+            if self.__entry is None:
+                self.__entry = _TreeEntry(self.__parse(tokens))
+                self.__cache.put(tokens, self.__entry)
+        self.__root = self.__entry.root
+
+    @classmethod
+    def set_cache_size(cls, maxsize):
+        '''
+        Bounds the number of parsed expressions kept around, 0 disables caching.
+        '''
+        cls.__cache.resize(maxsize)
+
+    @classmethod
+    def clear_cache(cls):
+        cls.__cache.clear()
+
+    @classmethod
+    def cache_info(cls):
+        return cls.__cache.info()
 
     def __tokenize(self, expr):
         state = 'none'
@@ -271,115 +653,165 @@ class ExpressionTree:
                     tokens.append(expr[token_start:i])
                     token_start = i
                 state = 'alpha'
+            elif c.isspace():
+                # whitespace ends the token we're in and is dropped, so '1 2' stays two numbers
+                tokens.append(expr[token_start:i])
+                token_start = i + 1
+                state = 'space'
             else:
                 raise Exception('something went wrong')
-        # for the first element in tokens, both 'token_start' and 'i' have the same value, 0
-        # this is why the first element that is appended to tokens is expr[0:0] = '', which we are deleting below
-        del tokens[0]
 
         if token_start != len(expr):
             tokens.append(expr[token_start:])
 
-        return tokens
-
-    def __get_priorities(self, tokens):
-        prios = []
-        prio_offset = 0
+        # the first element appended is expr[0:0] = '', and whitespace leaves more empty ones
+        return [t for t in tokens if t]
 
-        for t in tokens:
-            prio_offset += self.__PAREN_OFFSETS.get(t, 0)
-            prios.append(prio_offset + self.__PRIORITIES.get(t, 1000))
+    def __make_leaf(self, token):
+        if token.isdigit():
+            return _ConstNode(float(token))
+        elif token in self.__KNOWN_CONSTANTS:
+            return _ConstNode(self.__KNOWN_CONSTANTS.get(token))
+        return _VarNode(token)
 
-        return prios
+    def __reduce(self, operands, operators):
+        op = operators.pop()
+        if len(operands) < 2:
+            raise ExprException('{}: missing operand'.format(op))
+        right = operands.pop()
+        operands[-1] = _OpNode(op, operands[-1], right)
 
-    def __filter_parens(self, tokens, priorities):
+    def __parse(self, tokens):
         '''
-        If tokens contain functions, determine arity.
-        Filter out any parens along with the priorities in respective positions.
-        Returns: (filtered_tokens, filtered_priorities)
+        Single pass shunting-yard parser, linear in the number of tokens.
+        Operators of equal priority group to the right (a-b-c is a-(b-c)),
+        the same split the leftmost lowest priority operator always produced.
+        Operands and operators have to alternate, and each function argument
+        has to come down to one operand of its own.
         '''
-        tokens_list = []
-        priorities_list = []
-        for i in range(len(tokens)):
-            paren_count = 1
-            token_count = 0
-            if tokens[i] in _FuncNode.FUNCTIONS:
-                for j in range(i+2, len(tokens)):
-                    if tokens[j] == '(':
-                        paren_count += 1
-                    elif tokens[j] == ')':
-                        paren_count -= 1
-                    else:
-                        token_count += 1
-                    if paren_count == 0:
-                        break
-                tokens[i] = '{}_{}'.format(tokens[i], token_count)
-            if tokens[i] not in '()':
-                tokens_list.append(tokens[i])
-                priorities_list.append(priorities[i])
-
-        return (tokens_list, priorities_list)
-
-    def __parse(self, tokens, priorities):
-        # assuming expressions are always valid, if there's just one elem, it
-        # must be a constant
-        tok_parts = tokens[0].split('_')
-        if len(tokens) == 1:
-            if tokens[0].isdigit():
-                return _ConstNode(float(tokens[0]))
-            elif tokens[0] in self.__KNOWN_CONSTANTS:
-                return _ConstNode(self.__KNOWN_CONSTANTS.get(tokens[0]))
-            return _VarNode(tokens[0])
-        elif tok_parts[0] in _FuncNode.FUNCTIONS and len(tokens) == 1 + int(tok_parts[1]):
-            # split tokens by ',' and then send children as params for FuncNode
-            children = []
-
-            last_comma = 1
-            # NOTE: should not do this as a general practice
-            tokens.append(',')
-            i = 1
-            while i < len(tokens):
-                tok_parts2 = tokens[i].split('_')
-                if tok_parts2[0] in _FuncNode.FUNCTIONS:
-                    i += int(tok_parts2[1]) + 1
-
-                if tokens[i] == ',':
-                    children.append(self.__parse(tokens[last_comma:i], priorities[last_comma:i]))
-                    last_comma = i+1
-
-                i += 1
+        operands = []
+        # entries are operators, '(' or (function name, operands before its
+        # args, operands before its current arg)
+        operators = []
+        expect_operand = True
 
-            return _FuncNode(tok_parts[0], children)
-
-        min_pos = 0
-        min_val = 2**32
         i = 0
         while i < len(tokens):
-            tok_parts = tokens[i].split('_')
-            if tok_parts[0] in _FuncNode.FUNCTIONS:
-                i += int(tok_parts[1])
-
-            if priorities[i] < min_val:
-                min_val = priorities[i]
-                min_pos = i
+            t = tokens[i]
+            if t in self.__PRIORITIES:
+                if expect_operand:
+                    raise ExprException('{}: missing operand'.format(t))
+                prio = self.__PRIORITIES[t]
+                while (operators and operators[-1] in self.__PRIORITIES and
+                       self.__PRIORITIES[operators[-1]] > prio):
+                    self.__reduce(operands, operators)
+                operators.append(t)
+                expect_operand = True
+            elif t[0] in '+-*/^':
+                raise ExprException('{}: unknown operator'.format(t))
+            elif t in '),':
+                if expect_operand:
+                    raise ExprException('{}: missing operand'.format(t))
+                while operators and operators[-1] in self.__PRIORITIES:
+                    self.__reduce(operands, operators)
+                if not operators or (t == ',' and operators[-1] == '('):
+                    raise ExprException('{}: unbalanced parentheses'.format(t))
+                if operators[-1] != '(':
+                    func_name, first, arg_first = operators[-1]
+                    if len(operands) != arg_first + 1:
+                        raise ExprException('{}: malformed argument'.format(func_name))
+                    operators[-1] = (func_name, first, arg_first + 1)
+                if t == ')':
+                    top = operators.pop()
+                    if top != '(':
+                        func_name, first, _ = top
+                        children = operands[first:]
+                        del operands[first:]
+                        operands.append(_FuncNode(func_name, children))
+                else:
+                    expect_operand = True
+            elif not expect_operand:
+                raise ExprException('{}: missing operator'.format(t))
+            elif t in _FuncNode.FUNCTIONS:
+                if i+1 == len(tokens) or tokens[i+1] != '(':
+                    raise ExprException('{}: expected ('.format(t))
+                operators.append((t, len(operands), len(operands)))
+                i += 1
+            elif t == '(':
+                operators.append(t)
+            else:
+                operands.append(self.__make_leaf(t))
+                expect_operand = False
             i += 1
 
-        return _OpNode(
-            tokens[min_pos],
-            self.__parse(tokens[:min_pos], priorities[:min_pos]),
-            self.__parse(tokens[min_pos+1:], priorities[min_pos+1:])
-        )
-
-    def __build(self, expr):
-        tokens = self.__tokenize(expr)
-        prios = self.__get_priorities(tokens)
-        return self.__parse(*self.__filter_parens(tokens, prios))
+        while operators:
+            if operators[-1] not in self.__PRIORITIES:
+                raise ExprException('(: unbalanced parentheses')
+            self.__reduce(operands, operators)
+        if len(operands) != 1:
+            raise ExprException('malformed expression')
+        return operands[0]
 
     def eval(self):
         return self.__root.eval()
 
-    def differentiate(self):
-        return ExpressionTree(self.__root.differentiate())
+    def compile(self, variables=None):
+        '''
+        Builds a plain python function evaluating the expression, e.g.
+        ExpressionTree('x*y+1').compile()(x=2, y=3) == 7.
+        variables gives the positional order of the arguments and defaults to
+        the variables of the expression in sorted order.
+        '''
+        params = tuple(_variables(self.__root) if variables is None else variables)
+        if params not in self.__entry.compiled:
+            self.__entry.compiled[params] = _codegen(self.__root, params, _SCALAR_OPS, _SCALAR_FUNCTIONS)
+        return self.__entry.compiled[params]
+
+    def eval_array(self, xs, **bindings):
+        '''
+        Evaluates the expression for every element of xs at once, with x bound
+        to xs and other variables bound from bindings (scalars or arrays that
+        broadcast against xs).
+        Returns: a float array with the broadcast shape
+        '''
+        if np is None:
+            raise ImportError('eval_array() requires numpy')
+        if self.__entry.array_func is None:
+            params = ('x',) + tuple(v for v in _variables(self.__root) if v != 'x')
+            self.__entry.array_func = _codegen(
+                self.__root, params, _ARRAY_OPS, _ARRAY_FUNCTIONS,
+                const=lambda value: repr(float(value))
+            )
+        xs = np.asarray(xs, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            result = self.__entry.array_func(xs, **bindings)
+        shape = np.broadcast_shapes(xs.shape, np.shape(result))
+        return np.array(np.broadcast_to(result, shape), dtype=float)
+
+    def simplify(self):
+        return ExpressionTree(_simplify(self.__root))
+
+    def cse(self):
+        return ExpressionTree(_intern(self.__root))
+
+    def differentiate(self, simplify=True):
+        '''
+        Derivative with respect to x. Unless simplify is False, the result is
+        simplified and its common subexpressions are shared, and it is kept
+        alongside the tree so later calls (or trees parsed from the same
+        cached text) reuse it.
+        '''
+        if not simplify:
+            return ExpressionTree(_differentiate(self.__root))
+        if self.__entry.derivative is None:
+            self.__entry.derivative = _TreeEntry(_intern(_simplify(_differentiate(self.__root))))
+        return ExpressionTree(self.__entry.derivative)
+
+    def node_counts(self):
+        '''
+        Returns: (distinct nodes, nodes with shared subtrees counted every time)
+        '''
+        return _count_nodes(self.__root)
 
     def __str__(self):
         return self.__root.dump()
@@ -421,14 +853,122 @@ class MainWindow(QWidget):
         self.__graph.zoom_factor -= 5
 
 
+class CurveSampler:
+    '''
+    Adaptive sampling of y = f(x) for plotting.
+    The x axis is cut into tiles TILE_PIXELS wide at a resolution of 2^level
+    world units per pixel, the largest power of two not coarser than the zoom.
+    Each tile starts from a coarse grid and is subdivided where the curve
+    bends more than tolerance pixels away from the chord, or where it becomes
+    undefined. Tiles are kept per level, so panning samples only the newly
+    exposed tiles and zooming within a level samples nothing new.
+    '''
+    TILE_PIXELS = 128
+    INITIAL_INTERVALS = 8
+    MAX_DEPTH = 6
+
+    def __init__(self, tree, tolerance=0.5, max_tiles=1024, max_polylines=16):
+        self.__func = tree.compile(('x',))
+        self.__tolerance = tolerance
+        self.__max_tiles = max_tiles
+        self.__max_polylines = max_polylines
+        self.__tiles = OrderedDict()
+        self.__polylines = OrderedDict()
+
+    def __eval(self, x):
+        try:
+            y = self.__func(x)
+        except (ArithmeticError, ValueError, TypeError):
+            return None
+        if isinstance(y, complex) or not math.isfinite(y):
+            return None
+        return y
+
+    def __sample_tile(self, level, index):
+        pixel = 2.0 ** level
+        tolerance = self.__tolerance * pixel
+        step = self.TILE_PIXELS * pixel / self.INITIAL_INTERVALS
+        xs = [(index * self.INITIAL_INTERVALS + i) * step for i in range(self.INITIAL_INTERVALS + 1)]
+        ys = [self.__eval(x) for x in xs]
+
+        points = [(xs[0], ys[0])]
+        for i in range(self.INITIAL_INTERVALS):
+            # depth first, left half on top, so points come out in order
+            stack = [(xs[i], ys[i], xs[i+1], ys[i+1], 0)]
+            while stack:
+                xa, ya, xb, yb, depth = stack.pop()
+                if depth < self.MAX_DEPTH:
+                    xm = (xa + xb) / 2
+                    ym = self.__eval(xm)
+                    if ya is None or ym is None or yb is None:
+                        smooth = ya is None and ym is None and yb is None
+                    else:
+                        smooth = abs(ym - (ya + yb) / 2) <= tolerance
+                    if not smooth:
+                        stack.append((xm, ym, xb, yb, depth+1))
+                        stack.append((xa, ya, xm, ym, depth+1))
+                        continue
+                points.append((xb, yb))
+        return points
+
+    def __tile(self, level, index):
+        key = (level, index)
+        points = self.__tiles.get(key)
+        if points is None:
+            points = self.__sample_tile(level, index)
+            self.__tiles[key] = points
+            if len(self.__tiles) > self.__max_tiles:
+                self.__tiles.popitem(last=False)
+        else:
+            self.__tiles.move_to_end(key)
+        return points
+
+    def polylines(self, x0, x1, zoom):
+        '''
+        Returns: QPolygonF list in world coordinates covering [x0, x1], one per
+        stretch where the function is defined
+        '''
+        key = (x0, x1, zoom)
+        polylines = self.__polylines.get(key)
+        if polylines is not None:
+            self.__polylines.move_to_end(key)
+            return polylines
+
+        level = math.floor(math.log2(1 / zoom))
+        width = self.TILE_PIXELS * 2.0 ** level
+        polylines = []
+        run = []
+        for index in range(math.floor(x0 / width), math.floor(x1 / width) + 1):
+            points = self.__tile(level, index)
+            # a tile starts where the previous one ended
+            for x, y in points[1:] if run else points:
+                if y is None:
+                    if len(run) > 1:
+                        polylines.append(QPolygonF(run))
+                    run = []
+                else:
+                    run.append(QPointF(x, y))
+        if len(run) > 1:
+            polylines.append(QPolygonF(run))
+
+        self.__polylines[key] = polylines
+        if len(self.__polylines) > self.__max_polylines:
+            self.__polylines.popitem(last=False)
+        return polylines
+
+
 class Graph(QFrame):
-    def __init__(self):
+    def __init__(self, expression='sin(x)'):
         super().__init__()
         self.__zoom_factor = 10.0
+        self.__center_x = 0.0
+        self.__center_y = 0.0
+        self.__drag_pos = None
+        self.expression = ExpressionTree(expression)
 
     def transform(self, x, y):
-        new_x = self.__zoom_factor * x + self.width() / 2
-        new_y = self.height() / 2 - self.__zoom_factor * y
+        new_x = self.__zoom_factor * (x - self.__center_x) + self.width() / 2
+        new_y = self.height() / 2 - self.__zoom_factor * (y - self.__center_y)
         return new_x, new_y
 
     def paintEvent(self, event):
@@ -438,20 +978,52 @@ class Graph(QFrame):
 
         p.fillRect(rect, QColor(0x99d9ea))
 
+        origin_x, origin_y = self.transform(0, 0)
         line_pen = QPen(QColor(0x000000))
         p.setPen(line_pen)
-        p.drawLine(0, rect.height() // 2, rect.width(), rect.height() // 2)
-        p.drawLine(rect.width() // 2, 0, rect.width() // 2, rect.height())
+        p.drawLine(0, int(origin_y), rect.width(), int(origin_y))
+        p.drawLine(int(origin_x), 0, int(origin_x), rect.height())
 
+        # the polylines are in world coordinates, the painter maps them to pixels
         func_pen = QPen(QColor(0xff0000))
+        func_pen.setCosmetic(True)
         p.setPen(func_pen)
-        x = -100
-        while x <= 100:
-            p.drawLine(*self.transform(x-1, math.sin(x-1)), *self.transform(x, math.sin(x)))
-            x += 0.1
+        p.save()
+        p.translate(origin_x, origin_y)
+        p.scale(self.__zoom_factor, -self.__zoom_factor)
+        half_width = rect.width() / 2 / self.__zoom_factor
+        for polyline in self.__sampler.polylines(
+                self.__center_x - half_width, self.__center_x + half_width, self.__zoom_factor):
+            p.drawPolyline(polyline)
+        p.restore()
 
         p.drawText(10, 10, "this is sparta")
 
+    def mousePressEvent(self, event):
+        self.__drag_pos = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self.__drag_pos is None:
+            return
+        delta = event.pos() - self.__drag_pos
+        self.__drag_pos = event.pos()
+        self.__center_x -= delta.x() / self.__zoom_factor
+        self.__center_y += delta.y() / self.__zoom_factor
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self.__drag_pos = None
+
+    @property
+    def expression(self):
+        return self.__expression
+
+    @expression.setter
+    def expression(self, tree):
+        self.__expression = tree
+        self.__sampler = CurveSampler(tree)
+        self.update()
+
     @property
     def zoom_factor(self):
         return self.__zoom_factor
@@ -471,6 +1043,61 @@ def main():
     print('result = {:.5f}'.format(diff_tree.eval()))
 
 
+def bench_parse(sizes=(10, 100, 1000, 10000, 100000)):
+    # 'sin(x)*2+' is 7 tokens
+    for size in sizes:
+        expr = 'sin(x)*2+' * (size // 7) + '1'
+        start = time.perf_counter()
+        ExpressionTree(expr)
+        elapsed = time.perf_counter() - start
+        tokens = size // 7 * 7 + 1
+        print('{:>7} tokens: {:.4f}s ({:.2f}us/token)'.format(tokens, elapsed, elapsed / tokens * 1e6))
+
+
+def bench_memory(size=1000000):
+    # 'x*2+' is 4 tokens, one node each
+    expr = 'x*2+' * (size // 4) + 'x'
+    ExpressionTree.clear_cache()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = ExpressionTree(expr)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    nodes = tree.node_counts()[0]
+    print('{} nodes: {:.1f} MB ({:.1f} bytes/node)'.format(nodes, used / 2**20, used / nodes))
+    ExpressionTree.clear_cache()
+
+
+def bench_simplify(expr='x^x', order=5):
+    raw = simplified = ExpressionTree(expr)
+    for i in range(1, order+1):
+        raw = raw.differentiate(simplify=False)
+        simplified = simplified.differentiate()
+        raw_distinct, raw_tree = raw.node_counts()
+        distinct, tree = simplified.node_counts()
+        print('d{}/dx{}: {} tree nodes ({} distinct) -> {} distinct nodes ({} as a tree)'.format(
+            i, i, raw_tree, raw_distinct, distinct, tree))
+
+
+def bench_compile(expr='sin(2)*3+log(8,2)^2-exp(1)/4+cos(pi)', count=100000):
+    tree = ExpressionTree(expr)
+    func = tree.compile()
+
+    start = time.perf_counter()
+    for _ in range(count):
+        tree.eval()
+    tree_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    func_time = time.perf_counter() - start
+
+    print('{} x {}'.format(expr, count))
+    print('eval():    {:.3f}s'.format(tree_time))
+    print('compile(): {:.3f}s ({:.1f}x)'.format(func_time, tree_time / func_time))
+
+
 def gui_main():
     app = QApplication(sys.argv)
     w = MainWindow()
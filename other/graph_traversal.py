@@ -1,4 +1,14 @@
 
+import os
+import time
+import random
+from array import array
+from itertools import accumulate
+from collections import deque, namedtuple
+from contextlib import redirect_stdout
+from multiprocessing import Pool, shared_memory
+
+
 class Node:
     def __init__(self, value):
         self.value = value
@@ -14,50 +24,641 @@ class Node:
     def __repr__(self):
         return '%d' % self.value
 
+    def to_csr(self):
+        '''
+        Returns: CSRGraph of every node reachable from this one
+        '''
+        return CSRGraph.from_nodes([self])
 
-def dfs(node, visited, indent):
-    if node in visited:
-        print('{}already visited {}'.format(indent, node))
-        return
 
-    # print current node
-    print('{}visited = {}'.format(indent, visited))
-    print('{}at {}'.format(indent, node))
-    visited.add(node)
+class CSRGraph:
+    '''
+    Graph in compressed sparse row form, with vertices 0..n-1.
+    The neighbors of v are targets[offsets[v]:offsets[v+1]], where offsets
+    is an array('q') of n+1 entries and targets an array('i').
+    Graphs converted from Node objects keep them in labels (vertex -> Node)
+    and index (Node -> vertex).
+    directed is False when every edge is also stored the other way round.
+    '''
+    def __init__(self, offsets, targets, labels=None, directed=False):
+        self.offsets = offsets
+        self.targets = targets
+        self.labels = labels
+        self.directed = directed
+        self.index = None if labels is None else {node: v for v, node in enumerate(labels)}
+
+    @property
+    def vertex_count(self):
+        return len(self.offsets) - 1
+
+    @property
+    def edge_count(self):
+        return len(self.targets)
+
+    @classmethod
+    def from_edges(cls, vertex_count, edges, directed=False):
+        '''
+        Builds the graph from (u, v) pairs; unless directed, each pair is an edge
+        both ways. Neighbors keep the order the edges were given in.
+        '''
+        sources = array('i')
+        dests = array('i')
+        for u, v in edges:
+            sources.append(u)
+            dests.append(v)
+
+        degrees = [0] * (vertex_count + 1)
+        for u in sources:
+            degrees[u+1] += 1
+        if not directed:
+            for v in dests:
+                degrees[v+1] += 1
+        offsets = array('q', accumulate(degrees))
+
+        targets = array('i', [0]) * offsets[-1]
+        fill = list(offsets[:-1])
+        for u, v in zip(sources, dests):
+            targets[fill[u]] = v
+            fill[u] += 1
+            if not directed:
+                targets[fill[v]] = u
+                fill[v] += 1
+        return cls(offsets, targets, directed=directed)
+
+    @classmethod
+    def from_nodes(cls, nodes):
+        '''
+        Converts the Node objects reachable from nodes. Vertices are numbered in
+        breadth first discovery order, neighbors keep their set iteration order.
+        The graph is directed unless every neighbor links back.
+        '''
+        labels = []
+        index = {}
+        for node in nodes:
+            if node not in index:
+                index[node] = len(labels)
+                labels.append(node)
+        head = 0
+        while head < len(labels):
+            for n in labels[head].neighbors:
+                if n not in index:
+                    index[n] = len(labels)
+                    labels.append(n)
+            head += 1
+
+        offsets = array('q', [0])
+        targets = array('i')
+        for node in labels:
+            targets.extend(index[n] for n in node.neighbors)
+            offsets.append(len(targets))
+        directed = any(node not in n.neighbors for node in labels for n in node.neighbors)
+        return cls(offsets, targets, labels, directed)
+
+    def neighbors(self, v):
+        return self.targets[self.offsets[v]:self.offsets[v+1]]
+
+    def transpose(self):
+        '''
+        Returns: the graph with every edge reversed, the in-neighbors of v
+        being in increasing order of their vertex
+        '''
+        n = self.vertex_count
+        offsets, targets = self.offsets, self.targets
+        degrees = [0] * (n + 1)
+        for v in targets:
+            degrees[v+1] += 1
+        reversed_offsets = array('q', accumulate(degrees))
+        reversed_targets = array('i', [0]) * len(targets)
+        fill = list(reversed_offsets[:-1])
+        for u in range(n):
+            for v in targets[offsets[u]:offsets[u+1]]:
+                reversed_targets[fill[v]] = u
+                fill[v] += 1
+        return CSRGraph(reversed_offsets, reversed_targets, self.labels, self.directed)
 
-    # go down on me
-    for n in node.neighbors:
-        print('{}going on {}'.format(indent, n))
-        dfs(n, visited, indent + '   ')
+    def dfs(self, start):
+        '''
+        Iterative depth first search, visiting vertices in the same order as the
+        recursive dfs() does on the equivalent Node graph.
+        Returns: (visit order, parent per vertex with -1 for the start and
+        unreached vertices), both array('i')
+        '''
+        offsets, targets = self.offsets, self.targets
+        visited = bytearray(self.vertex_count)
+        parent = array('i', [-1]) * self.vertex_count
+        order = array('i', [start])
+        visited[start] = 1
 
-    print('{}done with {}'.format(indent, node))
+        # per stack level: the vertex and the next of its edges to look at
+        stack = [start]
+        edges = [offsets[start]]
+        while stack:
+            v = stack[-1]
+            e = edges[-1]
+            end = offsets[v+1]
+            while e < end and visited[targets[e]]:
+                e += 1
+            if e == end:
+                stack.pop()
+                edges.pop()
+                continue
+            w = targets[e]
+            edges[-1] = e + 1
+            visited[w] = 1
+            parent[w] = v
+            order.append(w)
+            stack.append(w)
+            edges.append(offsets[w])
+        return order, parent
 
+    def bfs(self, start):
+        '''
+        Breadth first search, the visit order doubles as the queue.
+        Returns: (visit order, parent per vertex with -1 for the start and
+        unreached vertices), both array('i')
+        '''
+        offsets, targets = self.offsets, self.targets
+        visited = bytearray(self.vertex_count)
+        parent = array('i', [-1]) * self.vertex_count
+        order = array('i', [start])
+        visited[start] = 1
 
-def bfs(start_node):
-    visited = set()
-    q = [(start_node, '')]
+        head = 0
+        while head < len(order):
+            v = order[head]
+            head += 1
+            for w in targets[offsets[v]:offsets[v+1]]:
+                if not visited[w]:
+                    visited[w] = 1
+                    parent[w] = v
+                    order.append(w)
+        return order, parent
 
-    while len(q) > 0:
-        # pop queue
-        node, indent = q[0]
-        print('{}queue = {}'.format(indent, [x[0] for x in q]))
-        del q[0]
 
+# kind is one of the constants below, parent is the node the traversal came
+# from (the source node for EDGE), depth counts steps from the start node
+TraversalEvent = namedtuple('TraversalEvent', ['kind', 'node', 'parent', 'depth'])
+
+DISCOVER = 'discover'
+FINISH = 'finish'
+ALREADY_VISITED = 'already visited'
+EDGE = 'edge'
+
+
+def dfs_events(start_node, visited=None):
+    '''
+    Depth first traversal as a lazy stream of TraversalEvent, in the order the
+    recursive traversal would produce them.
+    '''
+    if visited is None:
+        visited = set()
+    if start_node in visited:
+        yield TraversalEvent(ALREADY_VISITED, start_node, None, 0)
+        return
+
+    visited.add(start_node)
+    yield TraversalEvent(DISCOVER, start_node, None, 0)
+    stack = [(start_node, None, iter(start_node.neighbors))]
+    while stack:
+        node, parent, neighbors = stack[-1]
+        depth = len(stack) - 1
+        for n in neighbors:
+            yield TraversalEvent(EDGE, n, node, depth)
+            if n in visited:
+                yield TraversalEvent(ALREADY_VISITED, n, node, depth+1)
+            else:
+                visited.add(n)
+                yield TraversalEvent(DISCOVER, n, node, depth+1)
+                stack.append((n, node, iter(n.neighbors)))
+                break
+        else:
+            stack.pop()
+            yield TraversalEvent(FINISH, node, parent, depth)
+
+
+def bfs_events(start_node, visited=None):
+    '''
+    Breadth first traversal as a lazy stream of TraversalEvent. Like bfs(), every
+    neighbor is queued (EDGE) and skipped when dequeued if already visited.
+    '''
+    if visited is None:
+        visited = set()
+    q = deque([(start_node, None, 0)])
+
+    while q:
+        node, parent, depth = q.popleft()
         if node in visited:
-            print('{}already visited {}'.format(indent, node))
+            yield TraversalEvent(ALREADY_VISITED, node, parent, depth)
             continue
 
-        # print current node
-        print('{}visited = {}'.format(indent, visited))
-        print('{}at {}'.format(indent, node))
         visited.add(node)
-
-        # expand visiting frontier
+        yield TraversalEvent(DISCOVER, node, parent, depth)
         for n in node.neighbors:
-            print('{}adding {}'.format(indent, n))
-            q.append((n, indent + '   '))
+            yield TraversalEvent(EDGE, n, node, depth)
+            q.append((n, node, depth+1))
+        yield TraversalEvent(FINISH, node, parent, depth)
+
+
+class PrintTracer:
+    '''
+    Prints dfs_events() the way dfs() always has, keeping its own copy of the
+    visited set.
+    '''
+    EDGE_VERB = 'going on'
+
+    def __init__(self, visited=(), indent=''):
+        self.visited = set(visited)
+        self.indent = indent
+
+    def __call__(self, event):
+        indent = self.indent + '   ' * event.depth
+        if event.kind == ALREADY_VISITED:
+            print('{}already visited {}'.format(indent, event.node))
+        elif event.kind == DISCOVER:
+            # print current node
+            print('{}visited = {}'.format(indent, self.visited))
+            print('{}at {}'.format(indent, event.node))
+            self.visited.add(event.node)
+        elif event.kind == EDGE:
+            print('{}{} {}'.format(indent, self.EDGE_VERB, event.node))
+        elif event.kind == FINISH:
+            print('{}done with {}'.format(indent, event.node))
+
+
+class QueuePrintTracer(PrintTracer):
+    '''
+    Prints bfs_events() the way bfs() always has, mirroring the queue.
+    '''
+    EDGE_VERB = 'adding'
+
+    def __init__(self, start_node, visited=(), indent=''):
+        super().__init__(visited, indent)
+        self.queue = deque([start_node])
+
+    def __call__(self, event):
+        if event.kind in (DISCOVER, ALREADY_VISITED):
+            # pop queue
+            print('{}queue = {}'.format(self.indent + '   ' * event.depth, list(self.queue)))
+            self.queue.popleft()
+        elif event.kind == EDGE:
+            self.queue.append(event.node)
+        super().__call__(event)
+
+
+def dfs(node, visited, indent, tracer=None):
+    '''
+    Prints the traversal step by step, or passes the events to tracer instead.
+    '''
+    if tracer is None:
+        tracer = PrintTracer(visited, indent)
+    for event in dfs_events(node, visited):
+        tracer(event)
+
+
+def bfs(start_node, tracer=None):
+    '''
+    Prints the traversal step by step, or passes the events to tracer instead.
+    '''
+    if tracer is None:
+        tracer = QueuePrintTracer(start_node)
+    for event in bfs_events(start_node):
+        tracer(event)
+
+
+# Whole-graph algorithms on CSRGraph. With workers set, they run on a process
+# pool that reads the graph from shared memory instead of pickling it.
+
+_shared = {}
+
+
+class _SharedArrays:
+    '''
+    Copies arrays into shared memory blocks for pool workers; use as a context
+    manager so the blocks are unlinked afterwards.
+    '''
+    def __init__(self, **arrays):
+        self.specs = {}
+        self.__blocks = {}
+        self.__views = []
+        for key, values in arrays.items():
+            size = len(values) * values.itemsize
+            # an empty array still needs one item to cast the block to its typecode
+            block = shared_memory.SharedMemory(create=True, size=max(size, values.itemsize))
+            block.buf[:size] = memoryview(values).cast('B')
+            self.__blocks[key] = block
+            self.specs[key] = (block.name, values.typecode, len(values))
+
+    def view(self, key):
+        _, typecode, length = self.specs[key]
+        view = self.__blocks[key].buf.cast(typecode)[:length]
+        self.__views.append(view)
+        return view
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for view in self.__views:
+            view.release()
+        for block in self.__blocks.values():
+            block.close()
+            block.unlink()
+
+
+def _attach_shared(specs):
+    # pool initializer: map the parent's blocks into this worker
+    for key, (name, typecode, length) in specs.items():
+        # workers share the parent's resource tracker, which unlinks the
+        # blocks only if the parent fails to
+        block = shared_memory.SharedMemory(name=name)
+        _shared[key] = block.buf.cast(typecode)[:length]
+        _shared[key + '_block'] = block
+
+
+def _top_down_step(offsets, targets, dist, frontier, level):
+    found = array('i')
+    for v in frontier:
+        for w in targets[offsets[v]:offsets[v+1]]:
+            if dist[w] < 0:
+                dist[w] = level + 1
+                found.append(w)
+    return found
+
+
+def _bottom_up_step(offsets, targets, dist, lo, hi, level):
+    found = array('i')
+    for v in range(lo, hi):
+        if dist[v] < 0:
+            for w in targets[offsets[v]:offsets[v+1]]:
+                if dist[w] == level:
+                    dist[v] = level + 1
+                    found.append(v)
+                    break
+    return found
+
 
-        print('{}done with {}'.format(indent, node))
+def _top_down_worker(args):
+    frontier, level = args
+    return _top_down_step(_shared['offsets'], _shared['targets'], _shared['dist'], frontier, level)
+
+
+def _bottom_up_worker(args):
+    lo, hi, level = args
+    # in-edges are only shared for directed graphs, otherwise they are the out-edges
+    offsets = _shared.get('in_offsets', _shared['offsets'])
+    targets = _shared.get('in_targets', _shared['targets'])
+    return _bottom_up_step(offsets, targets, _shared['dist'], lo, hi, level)
+
+
+def _find(parent, v):
+    while parent[v] != v:
+        # path halving
+        parent[v] = parent[parent[v]]
+        v = parent[v]
+    return v
+
+
+def _union_edges(offsets, targets, parent, lo, hi):
+    '''
+    Unions the edges of vertices lo..hi-1; the smaller root always wins, so a
+    component ends up labelled with its smallest vertex.
+    '''
+    for u in range(lo, hi):
+        for v in targets[offsets[u]:offsets[u+1]]:
+            a = _find(parent, u)
+            b = _find(parent, v)
+            if a < b:
+                parent[b] = a
+            elif b < a:
+                parent[a] = b
+
+
+def _union_find_worker(args):
+    lo, hi = args
+    offsets, targets = _shared['offsets'], _shared['targets']
+    parent = array('i', range(len(offsets) - 1))
+    _union_edges(offsets, targets, parent, lo, hi)
+    # only the vertices this range merged matter to the parent process
+    merged = array('i')
+    roots = array('i')
+    for v in range(len(parent)):
+        if parent[v] != v:
+            merged.append(v)
+            roots.append(_find(parent, v))
+    return merged, roots
+
+
+def _ranges(n, parts):
+    step = max(-(-n // parts), 1)
+    return [(lo, min(lo + step, n)) for lo in range(0, n, step)]
+
+
+# out-edges for top-down steps, in-edges for bottom-up ones
+_BFSEdges = namedtuple('_BFSEdges', ['offsets', 'targets', 'in_offsets', 'in_targets'])
+
+
+def bfs_levels(graph, source, workers=None, alpha=14, beta=24):
+    '''
+    Level synchronous, direction optimizing breadth first search.
+    A level is expanded top-down (frontier vertices claim unvisited neighbors)
+    until the frontier's edges exceed 1/alpha of the edges left unexplored,
+    then bottom-up (unvisited vertices look for an in-neighbor in the frontier)
+    until the frontier shrinks below 1/beta of the vertices. Directed graphs
+    are transposed once for the bottom-up steps.
+    With workers, each level is split across that many processes.
+    Returns: array('i') of hop distances from source, -1 where unreachable
+    '''
+    n = graph.vertex_count
+    dist = array('i', [-1]) * n
+    dist[source] = 0
+    edges = _BFSEdges(graph.offsets, graph.targets, graph.offsets, graph.targets)
+    if graph.directed:
+        reverse = graph.transpose()
+        edges = edges._replace(in_offsets=reverse.offsets, in_targets=reverse.targets)
+
+    if workers is None:
+        return _bfs_levels(edges, dist, source, alpha, beta, None, None)
+
+    arrays = dict(offsets=graph.offsets, targets=graph.targets, dist=dist)
+    if graph.directed:
+        arrays.update(in_offsets=edges.in_offsets, in_targets=edges.in_targets)
+    with _SharedArrays(**arrays) as shared:
+        with Pool(workers, _attach_shared, (shared.specs,)) as pool:
+            _bfs_levels(edges, shared.view('dist'), source, alpha, beta, pool, workers)
+        return array('i', shared.view('dist'))
+
+
+def _bfs_levels(edges, dist, source, alpha, beta, pool, workers):
+    offsets, targets = edges.offsets, edges.targets
+    n = len(dist)
+    frontier = array('i', [source])
+    unexplored_edges = len(targets) - (offsets[source+1] - offsets[source])
+    bottom_up = False
+    level = 0
+
+    while frontier:
+        if bottom_up:
+            bottom_up = len(frontier) >= n / beta
+        else:
+            frontier_edges = sum(offsets[v+1] - offsets[v] for v in frontier)
+            bottom_up = frontier_edges > unexplored_edges / alpha
+
+        if pool is None:
+            if bottom_up:
+                frontier = _bottom_up_step(edges.in_offsets, edges.in_targets, dist, 0, n, level)
+            else:
+                frontier = _top_down_step(offsets, targets, dist, frontier, level)
+        else:
+            if bottom_up:
+                parts = pool.map(_bottom_up_worker, [(lo, hi, level) for lo, hi in _ranges(n, workers)])
+            else:
+                chunks = _ranges(len(frontier), workers)
+                parts = pool.map(_top_down_worker, [(frontier[lo:hi], level) for lo, hi in chunks])
+            # workers may claim the same vertex in the same level
+            frontier = array('i', dict.fromkeys(v for part in parts for v in part))
+
+        unexplored_edges -= sum(offsets[v+1] - offsets[v] for v in frontier)
+        level += 1
+    return dist
+
+
+def connected_components(graph, workers=None):
+    '''
+    Union-find over every edge of the graph. With workers, each process unions
+    the edges of a range of vertices and the merges are combined afterwards.
+    Returns: array('i') with the smallest vertex of each vertex's component
+    '''
+    n = graph.vertex_count
+    parent = array('i', range(n))
+
+    if workers is None:
+        _union_edges(graph.offsets, graph.targets, parent, 0, n)
+    else:
+        with _SharedArrays(offsets=graph.offsets, targets=graph.targets) as shared:
+            with Pool(workers, _attach_shared, (shared.specs,)) as pool:
+                parts = pool.map(_union_find_worker, _ranges(n, workers))
+        for merged, roots in parts:
+            for v, root in zip(merged, roots):
+                a = _find(parent, v)
+                b = _find(parent, root)
+                if a < b:
+                    parent[b] = a
+                elif b < a:
+                    parent[a] = b
+
+    for v in range(n):
+        parent[v] = _find(parent, v)
+    return parent
+
+
+class HopQueryEngine:
+    '''
+    Repeated point to point hop count queries on an undirected CSRGraph.
+    Queries run a bidirectional BFS that stops after the level where the two
+    searches meet. The per vertex buffers are allocated once: a vertex counts
+    as visited only if its stamp equals the current query's generation, so
+    nothing has to be cleared between queries.
+    With landmarks, BFS distances from the highest degree vertices give
+    bounds |d(L,s) - d(L,t)| <= d(s,t) <= d(s,L) + d(L,t), used to answer
+    or cut short queries.
+    '''
+    __MAX_GENERATION = 2**32 - 1
+
+    def __init__(self, graph, landmarks=0):
+        # the backward search walks out-edges and the bounds take d(s,L) = d(L,s)
+        if graph.directed:
+            raise ValueError('HopQueryEngine needs an undirected graph')
+        self.graph = graph
+        n = graph.vertex_count
+        self.__generation = 0
+        self.__forward_stamp = array('I', [0]) * n
+        self.__backward_stamp = array('I', [0]) * n
+        self.__forward_dist = array('i', [0]) * n
+        self.__backward_dist = array('i', [0]) * n
+
+        offsets = graph.offsets
+        by_degree = sorted(range(n), key=lambda v: offsets[v+1] - offsets[v], reverse=True)
+        self.__landmarks = [bfs_levels(graph, v) for v in by_degree[:landmarks]]
+
+    def __vertex(self, v):
+        if self.graph.index is not None and v in self.graph.index:
+            return self.graph.index[v]
+        return v
+
+    def __bounds(self, source, target):
+        lower = 0
+        upper = None
+        for dist in self.__landmarks:
+            ds, dt = dist[source], dist[target]
+            if ds < 0 and dt < 0:
+                continue
+            if ds < 0 or dt < 0:
+                # only one of them is in the landmark's component
+                return None, None
+            lower = max(lower, abs(ds - dt))
+            if upper is None or ds + dt < upper:
+                upper = ds + dt
+        return lower, upper
+
+    def __expand(self, frontier, stamp, dist, other_stamp, other_dist):
+        offsets, targets = self.graph.offsets, self.graph.targets
+        generation = self.__generation
+        found = array('i')
+        best = None
+        for v in frontier:
+            d = dist[v] + 1
+            for w in targets[offsets[v]:offsets[v+1]]:
+                if other_stamp[w] == generation:
+                    if best is None or d + other_dist[w] < best:
+                        best = d + other_dist[w]
+                if stamp[w] != generation:
+                    stamp[w] = generation
+                    dist[w] = d
+                    found.append(w)
+        return found, best
+
+    def distance(self, source, target):
+        '''
+        source and target are vertices, or Nodes for graphs built from them.
+        Returns: the number of hops on a shortest path, None if unreachable
+        '''
+        source, target = self.__vertex(source), self.__vertex(target)
+        if source == target:
+            return 0
+        lower, upper = self.__bounds(source, target)
+        if lower is None:
+            return None
+        if lower == upper:
+            return upper
+
+        if self.__generation == self.__MAX_GENERATION:
+            for stamp in (self.__forward_stamp, self.__backward_stamp):
+                stamp[:] = array('I', [0]) * len(stamp)
+            self.__generation = 0
+        self.__generation += 1
+        self.__forward_stamp[source] = self.__generation
+        self.__forward_dist[source] = 0
+        self.__backward_stamp[target] = self.__generation
+        self.__backward_dist[target] = 0
+
+        forward, backward = array('i', [source]), array('i', [target])
+        depth = 0
+        while forward and backward:
+            # any path not seen yet has at least depth + 1 hops
+            if upper is not None and depth + 1 >= upper:
+                return upper
+            if len(forward) <= len(backward):
+                forward, best = self.__expand(
+                    forward, self.__forward_stamp, self.__forward_dist,
+                    self.__backward_stamp, self.__backward_dist)
+            else:
+                backward, best = self.__expand(
+                    backward, self.__backward_stamp, self.__backward_dist,
+                    self.__forward_stamp, self.__forward_dist)
+            if best is not None:
+                return best if upper is None else min(best, upper)
+            depth += 1
+        return upper
 
 
 def main():
@@ -76,6 +677,80 @@ def main():
     print('\n\nBFS:')
     bfs(n[0])
 
+    graph = n[0].to_csr()
+    for name, traversal in (('DFS', graph.dfs), ('BFS', graph.bfs)):
+        order, parent = traversal(0)
+        print('\n\nCSR {}: {}'.format(name, [graph.labels[v] for v in order]))
+
+
+def bench_tracing(vertex_count=1000, edge_count=3000):
+    rnd = random.Random(0)
+    nodes = [Node(i) for i in range(vertex_count)]
+    for _ in range(edge_count):
+        a, b = rnd.sample(nodes, 2)
+        a.append_neighbor(b)
+
+    for name, events, traced in (('dfs', dfs_events, lambda: dfs(nodes[0], set(), '')),
+                                 ('bfs', bfs_events, lambda: bfs(nodes[0]))):
+        start = time.perf_counter()
+        count = sum(1 for _ in events(nodes[0]))
+        silent = time.perf_counter() - start
+
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            traced()
+            printed = time.perf_counter() - start
+
+        print('{}: {} events, silent {:.4f}s ({:.0f} events/s), traced {:.3f}s ({:.0f} events/s)'.format(
+            name, count, silent, count / silent, printed, count / printed))
+
+
+def bench_components(edge_counts=(10**6, 3*10**6, 10**7), workers=(None, 2, 4)):
+    # random graphs with an average degree of 8
+    for edge_count in edge_counts:
+        rnd = random.Random(edge_count)
+        vertex_count = edge_count // 4
+        start = time.perf_counter()
+        graph = CSRGraph.from_edges(
+            vertex_count,
+            ((rnd.randrange(vertex_count), rnd.randrange(vertex_count)) for _ in range(edge_count))
+        )
+        print('{} vertices, {} edges: built in {:.1f}s'.format(
+            vertex_count, edge_count, time.perf_counter() - start))
+
+        for count in workers:
+            start = time.perf_counter()
+            bfs_levels(graph, 0, workers=count)
+            bfs_time = time.perf_counter() - start
+            start = time.perf_counter()
+            connected_components(graph, workers=count)
+            cc_time = time.perf_counter() - start
+            print('  workers={}: bfs_levels {:.2f}s, connected_components {:.2f}s'.format(
+                count or 'serial', bfs_time, cc_time))
+
+
+def bench_queries(vertex_count=200000, edge_count=800000, queries=2000, landmarks=(0, 4, 16)):
+    rnd = random.Random(0)
+    graph = CSRGraph.from_edges(
+        vertex_count,
+        ((rnd.randrange(vertex_count), rnd.randrange(vertex_count)) for _ in range(edge_count))
+    )
+    pairs = [(rnd.randrange(vertex_count), rnd.randrange(vertex_count)) for _ in range(queries)]
+
+    for count in landmarks:
+        start = time.perf_counter()
+        engine = HopQueryEngine(graph, landmarks=count)
+        setup = time.perf_counter() - start
+
+        latencies = []
+        for source, target in pairs:
+            start = time.perf_counter()
+            engine.distance(source, target)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print('landmarks={}: setup {:.2f}s, latency p50 {:.3f}ms p90 {:.3f}ms p99 {:.3f}ms max {:.3f}ms'.format(
+            count, setup, *(latencies[int(q * (len(latencies) - 1))] * 1000 for q in (0.5, 0.9, 0.99, 1))))
+
 
 if __name__ == '__main__':
     main()